@@ -20,11 +20,15 @@ from google.cloud import firestore
 from config import config
 from gcp import db, storage_client, bucket, create_processing_task
 from your_user_module import User
-from processing import process_article_submission
+from processing import process_article_submission, reprocess_article
 from rss import generate_feed
 from logging_config import setup_logging
 from exceptions import ApplicationError, ProcessingError
-from extractor import extract_article
+from extractor import extract_article, get_cleaner_stats
+from tts import get_hedge_stats
+from host_scheduler import get_scheduler_stats
+from rule_matcher import invalidate_rules, pattern_key
+from selector_rules import parse_selector_list, validate_rule
 
 # --- Blueprints ---
 main_bp = Blueprint('main', __name__)
@@ -320,9 +324,13 @@ def debug_extract():
     url = request.args.get("url")
     if not url:
         return "Please provide a URL in the 'url' query parameter.", 400
+    # "offline" replays a previously fetched page from the fetch cache; "refresh" re-downloads it
+    cache_mode = request.args.get("cache", "default")
+    if cache_mode not in ("default", "refresh", "offline"):
+        return "The 'cache' query parameter must be default, refresh or offline.", 400
     
     try:
-        article_data = extract_article(url)
+        article_data = extract_article(url, cache_mode=cache_mode)
         extracted_text = article_data.get("text", "No text extracted.")
         return Response(extracted_text, mimetype="text/plain")
     except Exception as e:
@@ -345,7 +353,10 @@ def health_check():
 def debug_route():
     return jsonify({
         "status": "running",
-        "env": current_app.config["ENV_MODE"]
+        "env": current_app.config["ENV_MODE"],
+        "tts_hedging": get_hedge_stats(),
+        "html_cleaner_hits": get_cleaner_stats(),
+        "fetch_scheduler": get_scheduler_stats()
     })
 
 @main_bp.route("/item/<item_id>/tags", methods=["POST"])
@@ -434,7 +445,8 @@ def dashboard():
         items = [_doc_to_dict(doc) for doc in item_docs]
 
         for item in items:
-            item["storage_bytes"] = item.get("storage_bytes", "—")
+            storage_bytes = item.get("storage_bytes")
+            item["storage_bytes"] = humanize.naturalsize(storage_bytes) if storage_bytes else "—"
             item["error_message"] = item.get("error_message", None)
             item["extract_status"] = item.get("extract_status", None)
 
@@ -460,23 +472,36 @@ def dashboard():
 def manage_rules():
     if request.method == "POST":
         try:
-            pattern = request.form.get("pattern", "").strip().lower()
+            pattern = request.form.get("pattern", "").strip()
             pattern_type = request.form.get("pattern_type")
-            preferred_extractor = request.form.get("preferred_extractor")
+            preferred_extractor = request.form.get("preferred_extractor", "")
             description = request.form.get("description", "").strip()
-
-            if not all([pattern, pattern_type, preferred_extractor]):
-                flash("Pattern, type, and extractor are required.", "error")
+            selectors = {
+                "content_selector": request.form.get("content_selector", "").strip(),
+                "drop_selectors": parse_selector_list(request.form.get("drop_selectors", "")),
+                "title_selector": request.form.get("title_selector", "").strip(),
+                "author_selector": request.form.get("author_selector", "").strip(),
+            }
+            selector_error = validate_rule(selectors)
+
+            if not all([pattern, pattern_type]) or not (preferred_extractor or selectors["content_selector"]):
+                flash("Pattern, type, and an extractor or content selector are required.", "error")
+            elif not pattern_key(pattern, pattern_type):
+                flash(f"Pattern '{pattern}' doesn't name a site.", "error")
+            elif selector_error:
+                flash(selector_error, "error")
             else:
                 rule_ref = db.collection("extraction_rules").document()
                 rule_ref.set({
                     "pattern": pattern,
                     "pattern_type": pattern_type,
                     "preferred_extractor": preferred_extractor,
+                    **selectors,
                     "description": description,
                     "created_at": firestore.SERVER_TIMESTAMP,
                     "created_by": current_user.id
                 })
+                invalidate_rules()
                 flash("Extraction rule created successfully.", "success")
         except Exception as e:
             current_app.logger.error(f"Error creating extraction rule: {e}", exc_info=True)
@@ -503,12 +528,18 @@ def manage_rules():
 def delete_rule(rule_id):
     try:
         db.collection("extraction_rules").document(rule_id).delete()
+        invalidate_rules()
         flash("Rule deleted successfully.", "success")
     except Exception as e:
         current_app.logger.error(f"Error deleting rule {rule_id}: {e}", exc_info=True)
         flash("Failed to delete rule.", "error")
     return redirect(url_for("admin.manage_rules"))
 
+def _wants_full_reprocess() -> bool:
+    """?mode=full, or "mode": "full" in a JSON body, skips the TTS-only shortcut and re-extracts the article."""
+    body = request.get_json(silent=True) or {}
+    return (request.args.get("mode") or body.get("mode")) == "full"
+
 @admin_bp.route("/reprocess/<item_id>", methods=["POST"])
 @login_required
 @admin_required
@@ -520,7 +551,7 @@ def reprocess_item(item_id, doc_ref, doc):
         url = item.get("url")
         voice = item.get("voice", current_app.config["DEFAULT_VOICE"])
         doc_ref.update({"status": "reprocessing", "error_message": None, "published": False})
-        process_article_submission(doc_ref, url, voice)
+        reprocess_article(doc_ref, url, voice, full=_wants_full_reprocess(), item_data=item)
         return api_success(message=f"Item {item_id} is being reprocessed.")
     except Exception as e:
         error_message = f"Reprocess failed for item {item_id}: {e}"
@@ -590,12 +621,13 @@ def bulk_action():
                         blob.delete()
                 doc_ref.delete()
                 results[item_id] = "Success"
-            elif action == "retry":
+            elif action in ("retry", "reprocess"):
                 item = doc.to_dict()
                 url = item.get("url")
                 voice = item.get("voice", current_app.config["DEFAULT_VOICE"])
                 doc_ref.update({"status": "reprocessing", "error_message": None, "published": False})
-                process_article_submission(doc_ref, url, voice)
+                # "reprocess" always re-extracts; "retry" takes the cheapest path unless mode is "full"
+                reprocess_article(doc_ref, url, voice, full=action == "reprocess" or data.get("mode") == "full", item_data=item)
                 results[item_id] = "Success"
             elif action == "publish":
                 if doc.to_dict().get("status") == "done":
@@ -638,7 +670,7 @@ def retry_stuck_items():
                 url = item.get("url")
                 voice = item.get("voice", current_app.config["DEFAULT_VOICE"])
                 doc_ref.update({"status": "reprocessing", "error_message": None})
-                process_article_submission(doc_ref, url, voice)
+                reprocess_article(doc_ref, url, voice, full=_wants_full_reprocess(), item_data=item)
                 count += 1
             except Exception as e:
                 current_app.logger.error(f"Failed to retry item {item_id} during stuck-item-retry: {e}", exc_info=True, extra=_get_log_extra())
@@ -698,7 +730,12 @@ def task_handler():
     try:
         current_app.logger.info(f"Started processing item {item_id}.", extra=log_extra)
         doc_ref.update({"status": "processing"})
-        process_article_submission(doc_ref, item.get("url"), item.get("voice", current_app.config["DEFAULT_VOICE"]))
+        url, voice = item.get("url"), item.get("voice", current_app.config["DEFAULT_VOICE"])
+        if item.get("processed_at") or item.get("error_message"):
+            reprocess_article(doc_ref, url, voice, item_data=item)
+        else:
+            # A first attempt has no failure history worth looking up
+            process_article_submission(doc_ref, url, voice)
         elapsed = time.time() - start
         current_app.logger.info(f"Successfully processed item {item_id} in {elapsed:.2f} seconds.", extra=log_extra)
         return api_success(message=f"Successfully processed item {item_id}.")
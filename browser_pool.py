@@ -0,0 +1,126 @@
+"""
+Long-lived headless Chromium for the Playwright extractor.
+
+One browser per web worker process replaces a Chromium boot per article. Every render gets a
+fresh context, so no cookies or storage carry over between sites, and the context is closed
+afterwards. The browser is relaunched after PLAYWRIGHT_MAX_PAGES_PER_BROWSER pages, when it has
+disconnected, or after a browser-level error. Images, fonts, media and third-party scripts are
+blocked, and the document request is answered with the HTML we already fetched when there is one.
+
+The sync Playwright API is bound to the thread that started it, so a pool must only be used from
+one thread; extractor.py runs every render on its Playwright executor.
+"""
+import logging
+import os
+import threading
+from urllib.parse import urlparse
+
+from playwright.sync_api import Error as PlaywrightError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import sync_playwright
+
+logger = logging.getLogger(__name__)
+
+PLAYWRIGHT_MAX_PAGES_PER_BROWSER = int(os.getenv("PLAYWRIGHT_MAX_PAGES_PER_BROWSER", "50"))
+NAVIGATION_TIMEOUT_MS = 30000
+
+_BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+_LAUNCH_ARGS = ["--disable-dev-shm-usage", "--disable-gpu", "--no-first-run"]
+
+def _site(host: str) -> str:
+    """Last two labels of a host name; coarse, but enough to tell a site's own scripts from third-party ones."""
+    return ".".join((host or "").lower().split(".")[-2:])
+
+class BrowserPool:
+    def __init__(self, max_pages_per_browser: int):
+        self.max_pages_per_browser = max_pages_per_browser
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._owner_thread = None
+
+    def _check_thread(self):
+        if self._owner_thread is None:
+            self._owner_thread = threading.get_ident()
+        elif self._owner_thread != threading.get_ident():
+            raise RuntimeError("BrowserPool used from a different thread than the one that started Playwright.")
+
+    def _ensure_browser(self):
+        if self._browser is not None:
+            if not self._browser.is_connected():
+                logger.warning("Playwright browser disconnected; relaunching.")
+                self._close_browser()
+            elif self._pages_served >= self.max_pages_per_browser:
+                logger.info(f"Recycling Playwright browser after {self._pages_served} page(s).")
+                self._close_browser()
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        if self._browser is None:
+            self._browser = self._playwright.chromium.launch(headless=True, args=_LAUNCH_ARGS)
+            self._pages_served = 0
+            logger.info("Launched Playwright browser.")
+        return self._browser
+
+    def _close_browser(self):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception as e:
+                logger.debug(f"Ignoring error while closing Playwright browser: {e}")
+
+    def close(self):
+        self._check_thread()
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception as e:
+                logger.debug(f"Ignoring error while stopping Playwright: {e}")
+            self._playwright = None
+
+    def render(self, url: str, html: str = None, timeout_ms: int = NAVIGATION_TIMEOUT_MS) -> str:
+        """Loads url (served from html if given) with scripts running and returns the rendered DOM."""
+        self._check_thread()
+        browser = self._ensure_browser()
+        self._pages_served += 1
+        page_site = _site(urlparse(url).hostname)
+        document_served = False
+
+        def handle_route(route):
+            nonlocal document_served
+            request = route.request
+            if html is not None and not document_served and request.is_navigation_request():
+                document_served = True
+                route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+            elif request.resource_type in _BLOCKED_RESOURCE_TYPES:
+                route.abort()
+            elif request.resource_type == "script" and _site(urlparse(request.url).hostname) != page_site:
+                route.abort()
+            else:
+                route.continue_()
+
+        context = None
+        try:
+            context = browser.new_context()
+            context.route("**/*", handle_route)
+            browser_page = context.new_page()
+            browser_page.goto(url, timeout=timeout_ms)
+            return browser_page.content()
+        except PlaywrightTimeoutError:
+            raise
+        except PlaywrightError:
+            # Anything else from Playwright may mean the browser is wedged; start a fresh one next time
+            self._close_browser()
+            raise
+        finally:
+            if context is not None:
+                try:
+                    context.close()
+                except Exception as e:
+                    logger.debug(f"Ignoring error while closing Playwright context: {e}")
+
+_browser_pool = BrowserPool(PLAYWRIGHT_MAX_PAGES_PER_BROWSER)
+
+def get_browser_pool() -> BrowserPool:
+    return _browser_pool
@@ -27,3 +27,8 @@ class GCPInitializationError(ApplicationError):
     """Raised when Google Cloud client initialization fails."""
     def __init__(self, message="Failed to initialize Google Cloud services.", status_code=500):
         super().__init__(message, status_code)
+
+class FetchBlockedError(ExtractionError):
+    """Raised without making a request while a site's circuit breaker is open."""
+    def __init__(self, message="The website is refusing our requests; try again later.", status_code=503):
+        super().__init__(message, status_code)
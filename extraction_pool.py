@@ -0,0 +1,255 @@
+"""
+Process pool for the CPU-bound article extractors (newspaper3k, trafilatura, readability).
+
+Workers are started with the forkserver method and only import this module, so they never
+inherit the gRPC/Firestore clients held by the web worker. Each job gets the page as an HTML
+string. Every worker process is driven by its own thread in the web worker over a private pipe,
+and nothing else is shared with it. A job that overruns can't be stopped in place, so its
+process is killed; that can only break its own pipe, and the thread starts a replacement while
+other callers' jobs carry on. Jobs are timed from when they are handed to an idle process, not
+from when they were queued, and a job cancelled while still queued is never started.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import lxml.html
+import trafilatura
+from newspaper import Article as NewspaperArticle
+from readability import Document
+from trafilatura.settings import use_config
+
+from exceptions import ExtractionError
+
+logger = logging.getLogger(__name__)
+
+# 0 runs the extractors inline on the request thread, without timeouts (handy for local debugging)
+EXTRACTOR_POOL_SIZE = int(os.getenv("EXTRACTOR_POOL_SIZE", "3"))
+# Worker processes are replaced after this many pages to bound memory growth in the parsers
+EXTRACTOR_POOL_MAX_TASKS = int(os.getenv("EXTRACTOR_POOL_MAX_TASKS", "100"))
+
+def _worker_main(conn):
+    """Runs in a worker process: answers each (func, html, url) on conn with (ok, result or error) until conn closes."""
+    while True:
+        try:
+            func, html, url = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, func(html, url))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # The result or exception couldn't be pickled; send something that can be
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+def _element_text(el) -> str:
+    return " ".join(el.text_content().split())
+
+def parse_structured_content(root) -> list:
+    """Builds structured blocks from an lxml element, or from an HTML string parsed on the spot."""
+    if isinstance(root, str):
+        if not root.strip():
+            return []
+        root = lxml.html.fromstring(root)
+    content = []
+    allowed_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'blockquote']
+
+    for tag in root.iter(*allowed_tags):
+        if tag.tag == 'p':
+            text = _element_text(tag)
+            if text: content.append({"type": "p", "text": text})
+        elif tag.tag.startswith('h'):
+            text = _element_text(tag)
+            if text: content.append({"type": tag.tag, "text": text})
+        elif tag.tag in ['ul', 'ol']:
+            items = [_element_text(li) for li in tag.iter('li') if _element_text(li)]
+            if items: content.append({"type": tag.tag, "items": items})
+        elif tag.tag == 'blockquote':
+            text = _element_text(tag)
+            if text: content.append({"type": "blockquote", "text": text})
+    return content
+
+def text_from_blocks(blocks: list) -> str:
+    """Joins structured blocks back into plain text, one paragraph or list item per block."""
+    text_parts = []
+    for item in blocks:
+        if item['type'] in ['p', 'blockquote'] or item['type'].startswith('h'):
+            text_parts.append(item['text'])
+        elif item['type'] in ['ul', 'ol']:
+            text_parts.extend(item['items'])
+    return "\n\n".join(text_parts)
+
+def extract_with_newspaper(html: str, url: str) -> dict:
+    article = NewspaperArticle(url, language='en')
+    article.download(input_html=html)
+    article.parse()
+    return { "text": article.text, "title": article.title, "author": ", ".join(article.authors), "structured_text": [{"type": "p", "text": p.strip()} for p in article.text.split('\n') if p.strip()] }
+
+def extract_with_trafilatura(html: str, url: str) -> dict:
+    if not html:
+        raise ExtractionError("No HTML content provided for trafilatura.")
+    new_config = use_config()
+    new_config.set("DEFAULT", "MIN_EXTRACTED_SIZE", "150")
+    new_config.set("DEFAULT", "MIN_OUTPUT_SIZE", "100")
+    text = trafilatura.extract(html, url=url, config=new_config, include_comments=False, include_tables=False, deduplicate=True) or ""
+    return { "text": text, "structured_text": [{"type": "p", "text": p.strip()} for p in text.split('\n') if p.strip()] }
+
+def extract_with_readability(html: str, url: str) -> dict:
+    doc = Document(html)
+    summary_html = doc.summary()
+    text_parts = []
+    structured_content = parse_structured_content(summary_html)
+    for item in structured_content:
+        if item['type'] in ['p', 'blockquote'] or item['type'].startswith('h'):
+            text_parts.append(item['text'])
+        elif item['type'] in ['ul', 'ol']:
+            text_parts.extend(item['items'])
+    return { "text": "\n\n".join(text_parts), "title": doc.short_title(), "structured_text": structured_content }
+
+class _Worker(threading.Thread):
+    """Feeds jobs from the pool's queue to one worker process, replacing the process when it dies or is killed."""
+    def __init__(self, pool, index: int):
+        super().__init__(name=f"extractor-pool-{index}", daemon=True)
+        self.pool = pool
+        self.process = None
+        self.conn = None
+        self.tasks = 0
+        self.killed = False  # Set by kill(); the process is replaced before the next job
+
+    def _start_process(self):
+        parent_conn, child_conn = self.pool.ctx.Pipe()
+        self.process = self.pool.ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn, self.tasks, self.killed = parent_conn, 0, False
+
+    def _stop_process(self):
+        """Closes the pipe, which ends an idle process, and reaps it; a killed process is already gone."""
+        conn, process, self.conn, self.process = self.conn, self.process, None, None
+        if conn is not None:
+            conn.close()
+        if process is not None:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def kill(self):
+        """Called by cancel() with the pool lock held, only while this worker runs a job."""
+        self.killed = True
+        process = self.process
+        if process is not None and process.is_alive():
+            logger.warning(f"Killing extractor process {process.pid} to stop an abandoned job.")
+            process.kill()
+
+    def run(self):
+        while True:
+            job = self.pool._queue.get()
+            with self.pool._lock:
+                if job["state"] != "queued":
+                    continue # Cancelled while it waited
+                if self.process is None or self.killed or self.tasks >= self.pool.max_tasks_per_child:
+                    self._stop_process()
+                    self._start_process()
+                job["state"], job["worker"] = "running", self
+            self.tasks += 1
+            error = None
+            try:
+                self.conn.send((job["func"], job["html"], job["url"]))
+                if job["on_start"] is not None:
+                    job["on_start"](time.time())
+                ok, payload = self.conn.recv()
+            except (EOFError, OSError) as e:
+                ok, payload, error = False, None, e
+            with self.pool._lock:
+                cancelled = job["state"] == "cancelled"
+                job["state"] = "done"
+                self.pool._jobs.pop(job["id"], None)
+            if error is not None:
+                # Killed by cancel(), or crashed; either way this process is done
+                self._stop_process()
+                if not cancelled:
+                    job["on_done"](None, ExtractionError(f"Extractor process exited unexpectedly ({type(error).__name__})."))
+                continue
+            if cancelled:
+                continue
+            if ok:
+                job["on_done"](payload, None)
+            else:
+                job["on_done"](None, payload)
+
+class ExtractorPool:
+    """
+    Lazily started extractor processes, shared by all requests in this web worker.
+    Results are delivered through on_done(result, error) from a worker thread, and
+    on_start(started_at) is called from the same thread as a process is handed the job.
+    """
+    def __init__(self, processes: int, max_tasks_per_child: int):
+        self.processes = processes
+        self.max_tasks_per_child = max_tasks_per_child
+        self.ctx = None
+        self._workers = []
+        self._queue = queue.Queue()
+        self._jobs = {}  # job id -> job until it finishes or is cancelled
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Starts the worker threads; their processes start with their first job. Caller holds the lock."""
+        if self._workers:
+            return
+        self.ctx = multiprocessing.get_context("forkserver")
+        # Import the extractor libraries once in the fork server instead of in every worker
+        self.ctx.set_forkserver_preload([__name__])
+        self._workers = [_Worker(self, i) for i in range(self.processes)]
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Started extractor pool with {self.processes} process(es).")
+
+    def submit(self, func, html: str, url: str, on_done, on_start=None) -> int | None:
+        """Queues func(html, url) and returns a job id for cancel(); None when it ran inline."""
+        if self.processes <= 0:
+            if on_start is not None:
+                on_start(time.time())
+            try:
+                result = func(html, url)
+            except Exception as e:
+                on_done(None, e)
+                return None
+            on_done(result, None)
+            return None
+        job_id = next(self._job_ids)
+        job = {"id": job_id, "func": func, "html": html, "url": url, "on_done": on_done, "on_start": on_start, "state": "queued", "worker": None}
+        with self._lock:
+            self._start()
+            self._jobs[job_id] = job
+        self._queue.put(job)
+        return job_id
+
+    def cancel(self, job_id: int | None):
+        """
+        Abandons a job whose result is no longer wanted. A queued job is never started; a running
+        one has its process killed, which only affects the pipe that process shares with its thread.
+        """
+        if job_id is None:
+            return
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return # Already finished
+            running = job["state"] == "running"
+            job["state"] = "cancelled"
+            if running:
+                job["worker"].kill()
+
+_pool = ExtractorPool(EXTRACTOR_POOL_SIZE, EXTRACTOR_POOL_MAX_TASKS)
+
+def get_extractor_pool() -> ExtractorPool:
+    return _pool
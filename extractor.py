@@ -1,41 +1,56 @@
 import logging
+import re
 import requests
 from urllib.parse import urlparse
-
-# Mapping of domain names to specific extraction logic
-DOMAIN_RULES = {
-    "nytimes.com": lambda url, soup: soup.find("section", {"name": "articleBody"}),
-    "defector.com": lambda url, soup: soup.find("div", {"data-testid": "article-content"}),
-    "newyorker.com": lambda url, soup: soup.select_one("section[class*='body__inner-container']"),
-    "washingtonpost.com": lambda url, soup: soup.find("article"),
-    "bbc.com": lambda url, soup: soup.find("article"),
-    "scientificamerican.com": lambda url, soup: soup.find("article"),
-    "theatlantic.com": lambda url, soup: soup.find("div", {"class": "article-body"}),
-}
-import trafilatura
+import os
+import queue
+import threading
 import time
 import random
-from tenacity import retry, stop_after_attempt, wait_exponential
-from trafilatura.settings import use_config
-from readability import Document
-from bs4 import BeautifulSoup
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import lxml.html
 import json
 from urllib.parse import urljoin, urlparse
 from dateutil import parser as date_parser
-from newspaper import Article as NewspaperArticle
-from gcp import db # Import Firestore instance
 from exceptions import ExtractionError
+import extractor_stats
+import fetcher
+from rule_matcher import find_matching_rule, find_selector_rule
+from browser_pool import get_browser_pool
+from extraction_pool import extract_with_newspaper, extract_with_readability, extract_with_trafilatura, get_extractor_pool, parse_structured_content, text_from_blocks
 
 logger = logging.getLogger(__name__)
 
-# --- Caching for rules ---
-_rules_cache = None
-_rules_last_fetched = None
-_RULES_CACHE_TTL = 300 # 5 minutes
-
 # Configuration Constants
 REQUEST_TIMEOUT = 20
 MIN_EXTRACTED_TEXT_LENGTH = 250
+# Hard per-extractor limits in seconds; an extractor that overruns is recorded as failed
+EXTRACTOR_TIMEOUT = float(os.getenv("EXTRACTOR_TIMEOUT", "20"))
+EXTRACTOR_TIMEOUTS = {"playwright": float(os.getenv("PLAYWRIGHT_EXTRACTOR_TIMEOUT", "45"))}
+# Longest an extractor may wait for a free pool process or the browser thread before it counts as failed
+EXTRACTOR_QUEUE_TIMEOUT = float(os.getenv("EXTRACTOR_QUEUE_TIMEOUT", "30"))
+# auto hands pages to the headless browser only when _needs_javascript says so; always/never override that
+PLAYWRIGHT_MODE = os.getenv("PLAYWRIGHT_MODE", "auto").lower()
+# A result scoring at least this (see _score_extraction) skips the remaining extractors; above 1 disables early exit
+EXTRACTION_CONFIDENCE_THRESHOLD = float(os.getenv("EXTRACTION_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Fetch the AMP version of articles on domains where it has proven as good as the full page
+ALTERNATE_FETCH_ENABLED = os.getenv("ALTERNATE_FETCH_ENABLED", "true").lower() == "true"
+# Share of extractions that, once a domain's verdict is in, also extract the other version to keep it current
+ALTERNATE_PROBE_RATE = float(os.getenv("ALTERNATE_PROBE_RATE", "0.05"))
+# Seconds between comparisons for the same domain, however many of its articles come in
+ALTERNATE_PROBE_INTERVAL = float(os.getenv("ALTERNATE_PROBE_INTERVAL", "600"))
+_ALTERNATE_MIN_WORD_RATIO = 0.9 # AMP text this close to the full page's counts as holding up
+
+# The sync Playwright API is bound to the thread that started it, so all browser work runs here
+_playwright_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playwright")
+# Comparisons of AMP and full pages run off the request path, one at a time
+_alternate_probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alternate-probe")
+_alternate_probe_slot = threading.Semaphore(1)
+_ALTERNATE_PROBE_MAX_DOMAINS = 1000
+_alternate_probed = OrderedDict() # domain -> time of its last comparison
+_alternate_probed_lock = threading.Lock()
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -63,89 +78,244 @@ def _get_randomized_headers(url: str):
     
     return headers
 
-def _get_extraction_rules():
-    """Fetches extraction rules from Firestore with caching."""
-    global _rules_cache, _rules_last_fetched
-    now = time.time()
-    if _rules_cache and _rules_last_fetched and (now - _rules_last_fetched < _RULES_CACHE_TTL):
-        return _rules_cache
-    
+class ParsedPage:
+    """
+    A fetched page parsed once with lxml and shared by metadata extraction, cleaning,
+    domain rules and every extractor that accepts a tree. The HTML string is only
+    re-serialized, once, for libraries that insist on one. source_html is the page as
+    fetched, before cleaning stripped its scripts, for the headless browser to run.
+    structured_data is the page's schema.org article data, also read before cleaning.
+    """
+    def __init__(self, html_content: str, url: str):
+        self.url = url
+        self.source_html = html_content
+        self.tree = _parse_html(html_content)
+        self.structured_data = {}  # Filled by _read_structured_data before cleaning
+        self._html = None
+
+    @property
+    def html(self) -> str:
+        if self._html is None:
+            self._html = lxml.html.tostring(self.tree, encoding="unicode")
+        return self._html
+
+    def mark_modified(self):
+        """Drops the cached serialization after the tree has been changed in place."""
+        self._html = None
+
+def _parse_html(html_content: str):
     try:
-        rules = []
-        rules_query = db.collection("extraction_rules").stream()
-        for doc in rules_query:
-            rule = doc.to_dict()
-            rule["id"] = doc.id
-            rules.append(rule)
-        _rules_cache = rules
-        _rules_last_fetched = now
-        logger.info(f"Fetched and cached {len(rules)} extraction rules.")
-        return rules
-    except Exception as e:
-        logger.error(f"Could not fetch extraction rules from Firestore: {e}", exc_info=True)
-        return []
-
-def _find_matching_rule(url: str, domain: str, rules: list):
-    """Finds the best matching extraction rule for a given URL."""
-    for rule in rules:
-        if rule["pattern_type"] == "domain" and rule["pattern"] == domain:
-            return rule
-    for rule in rules:
-        if rule["pattern_type"] == "url_prefix" and url.startswith(rule["pattern"]):
-            return rule
+        return lxml.html.document_fromstring(html_content)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(html_content.encode("utf-8"))
+
+def _first(elements):
+    return elements[0] if elements else None
+
+def get_meta_content(tree, name=None, prop=None):
+    conditions = []
+    if name: conditions.append("@name=$name")
+    if prop: conditions.append("@property=$prop")
+    xpath = "//meta" + "".join(f"[{c}]" for c in conditions) + "/@content"
+    values = tree.xpath(xpath, name=name or "", prop=prop or "")
+    return values[0].strip() if values else ""
+
+def _get_title(tree) -> str:
+    title = tree.find(".//title")
+    return title.text_content() if title is not None else ""
+
+_ARTICLE_TYPES = frozenset([
+    "Article", "NewsArticle", "AnalysisNewsArticle", "OpinionNewsArticle", "ReportageNewsArticle",
+    "BlogPosting", "LiveBlogPosting", "Report", "ScholarlyArticle", "TechArticle",
+])
+_MARKUP_RE = re.compile(r"<(p|br|div|h[1-6]|ul|ol|blockquote)\b", re.IGNORECASE)
+
+def _is_article_type(value) -> bool:
+    types = value if isinstance(value, list) else [value]
+    return any(isinstance(t, str) and t.rsplit("/", 1)[-1] in _ARTICLE_TYPES for t in types)
+
+def _ld_objects(data):
+    """Yields every object in a JSON-LD document, looking inside lists, @graph and mainEntity."""
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, dict):
+            yield item
+            for key in ("@graph", "mainEntity"):
+                if isinstance(item.get(key), (list, dict)):
+                    stack.append(item[key])
+
+def _ld_text(value) -> str:
+    """A person, organization or image may be a string, an object with a name or url, or a list of either."""
+    values = value if isinstance(value, list) else [value]
+    found = []
+    for v in values:
+        if isinstance(v, dict):
+            v = v.get("name") or v.get("url")
+        if isinstance(v, str) and v.strip() and v.strip() not in found:
+            found.append(v.strip())
+    return ", ".join(found)
+
+def _microdata_value(el) -> str:
+    if el.get("itemscope") is not None:
+        name = _first(el.xpath(".//*[@itemprop='name']"))
+        if name is not None:
+            el = name
+    return (el.get("content") or el.get("datetime") or el.text_content() or "").strip()
+
+def _read_structured_data(tree) -> dict:
+    """
+    Reads the article's schema.org data: JSON-LD first, then microdata. Must run before cleaning,
+    which strips the <script> blocks JSON-LD lives in. Returns {} when the page has neither, else
+    any of headline, author, date_published, body, description, image, section and publisher.
+    """
+    articles = []
+    for script in tree.iter("script"):
+        if (script.get("type") or "").strip().lower() != "application/ld+json" or not script.text:
+            continue
+        try:
+            # strict=False: article bodies often carry raw newlines inside their strings
+            data = json.loads(script.text, strict=False)
+        except ValueError:
+            continue
+        articles.extend(obj for obj in _ld_objects(data) if _is_article_type(obj.get("@type")))
+    if articles:
+        article = max(articles, key=lambda a: len(a.get("articleBody") or "") if isinstance(a.get("articleBody"), str) else 0)
+        found = {
+            "headline": _ld_text(article.get("headline") or article.get("name")),
+            "author": _ld_text(article.get("author")),
+            "date_published": _ld_text(article.get("datePublished")),
+            "body": article.get("articleBody") if isinstance(article.get("articleBody"), str) else "",
+            "description": _ld_text(article.get("description")),
+            "image": _ld_text(article.get("image")),
+            "section": _ld_text(article.get("articleSection")),
+            "publisher": _ld_text(article.get("publisher")),
+        }
+        return {key: value.strip() for key, value in found.items() if value and value.strip()}
+
+    for scope in tree.xpath("//*[@itemscope][@itemtype]"):
+        if not _is_article_type(scope.get("itemtype").split()):
+            continue
+        found = {}
+        for prop, key in (("headline", "headline"), ("author", "author"), ("datePublished", "date_published"), ("description", "description")):
+            el = _first(scope.xpath(f".//*[@itemprop='{prop}']"))
+            value = _microdata_value(el) if el is not None else ""
+            if value:
+                found[key] = value
+        # The body itself is read from the cleaned tree by _extract_with_structured_data
+        return found
+    return {}
+
+_APP_ROOT_XPATH = "//*[" + " or ".join(f"@id='{i}'" for i in ("root", "app", "__next", "__nuxt", "___gatsby", "svelte")) + " or @data-reactroot]"
+_HYDRATION_MARKERS = ("__NEXT_DATA__", "__NUXT__", "__APOLLO_STATE__", "__INITIAL_STATE__", "__PRELOADED_STATE__", "__remixContext")
+_NOSCRIPT_WALL_RE = re.compile(r"(enable|turn on|requires?|need)\W+(\w+\W+){0,3}javascript|javascript\W+(\w+\W+){0,3}(is )?(required|disabled)", re.IGNORECASE)
+_VISIBLE_TEXT_XPATH = "//body//text()[not(ancestor::script or ancestor::style or ancestor::noscript or ancestor::template)]"
+# Static text beyond this means the server rendered the article, whatever scripts the page also ships
+_STATIC_TEXT_ENOUGH = 2000
+
+def _needs_javascript(tree, html_length: int) -> tuple[bool, str]:
+    """
+    Decides from the fetched, uncleaned page whether its article only appears once scripts run.
+    Looks for empty app roots, hydration blobs, noscript walls and a low text-to-markup ratio.
+    Returns (needs_javascript, reason).
+    """
+    text_length = sum(len(t.strip()) for t in tree.xpath(_VISIBLE_TEXT_XPATH))
+    ratio = text_length / html_length if html_length else 0.0
+    if text_length < MIN_EXTRACTED_TEXT_LENGTH:
+        return True, f"only {text_length} chars of static text"
+    if text_length >= _STATIC_TEXT_ENOUGH:
+        return False, f"{text_length} chars of static text"
+
+    empty_roots = [el.get("id") or "data-reactroot" for el in tree.xpath(_APP_ROOT_XPATH) if len(el.text_content().strip()) < 200]
+    if empty_roots:
+        return True, f"empty app root #{empty_roots[0]}"
+    noscript_wall = any(_NOSCRIPT_WALL_RE.search(el.text_content()) for el in tree.iter("noscript"))
+    if noscript_wall:
+        return True, "noscript asks for JavaScript"
+    hydration = next((m for script in tree.iter("script") for m in _HYDRATION_MARKERS if m in (script.get("id") or "") or m in (script.text or "")), None)
+    if hydration and ratio < 0.02:
+        return True, f"{hydration} hydration data with a {ratio:.1%} text-to-markup ratio"
+    return False, f"{text_length} chars of static text, {ratio:.1%} of the markup"
+
+# Pre-extraction cleaning rules, compiled into one predicate (_cleaning_rule) and applied in a single walk
+_CLEAN_TAGS = frozenset([
+    "script", "style", "noscript", "meta", "link", "svg", "img", # Common non-content tags
+    "aside", "footer", "header", "nav", "form", "iframe",
+])
+_CLEAN_CLASSES = frozenset([
+    "ad", "advertisement", "banner", "comments", "cookie-banner", "footer",
+    "header", "nav", "navbar", "newsletter-signup", "related-articles",
+    "share-buttons", "sidebar", "social-links", "popup", "modal",
+])
+# Generic ad classes/ids are matched on whole name parts ("ad-slot", "topAd", "adsbygoogle"),
+# so "header", "load" and "shadow" no longer count as ads
+_AD_NAME_PARTS = frozenset(["ad", "ads", "advert", "adverts", "advertisement", "advertising", "adsbygoogle", "adslot", "adunit"])
+_NAME_PART_SPLIT_RE = re.compile(r"[^A-Za-z0-9]+|(?<=[a-z0-9])(?=[A-Z])")
+# Distinctive enough to match anywhere in a class or id
+_CLEAN_NAME_SUBSTRINGS = ("cookie", "popup", "banner")
+# Never removed whatever their class, or a stray "ad" class would take the whole article with it
+_PROTECTED_TAGS = frozenset(["html", "body", "article", "main"])
+
+_cleaner_hits = Counter()
+_cleaner_hits_lock = threading.Lock()
+
+def get_cleaner_stats() -> dict:
+    """Returns process-wide counts of elements removed per cleaning rule, e.g. for the /debug endpoint."""
+    with _cleaner_hits_lock:
+        return dict(_cleaner_hits.most_common())
+
+def _cleaning_rule(el) -> str | None:
+    """Returns the name of the first cleaning rule el matches, or None to keep it."""
+    tag = el.tag
+    if tag in _CLEAN_TAGS:
+        return f"<{tag}>"
+    classes, element_id = el.get("class"), el.get("id")
+    if not classes and not element_id:
+        return None
+    if classes:
+        for name in classes.split():
+            if name in _CLEAN_CLASSES:
+                return f".{name}"
+    for value in (classes, element_id):
+        if not value:
+            continue
+        if any(part.lower() in _AD_NAME_PARTS for part in _NAME_PART_SPLIT_RE.split(value)):
+            return "ad name"
+        lowered = value.lower()
+        for word in _CLEAN_NAME_SUBSTRINGS:
+            if word in lowered:
+                return f"*{word}*"
     return None
 
-def _parse_structured_content(html_content: str) -> list:
-    soup = BeautifulSoup(html_content, "html.parser")
-    content = []
-    allowed_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'blockquote']
-    
-    for tag in soup.find_all(allowed_tags):
-        if tag.name == 'p':
-            text = tag.get_text(strip=True)
-            if text: content.append({"type": "p", "text": text})
-        elif tag.name.startswith('h'):
-            text = tag.get_text(strip=True)
-            if text: content.append({"type": tag.name, "text": text})
-        elif tag.name in ['ul', 'ol']:
-            items = [li.get_text(strip=True) for li in tag.find_all('li') if li.get_text(strip=True)]
-            if items: content.append({"type": tag.name, "items": items})
-        elif tag.name == 'blockquote':
-            text = tag.get_text(strip=True)
-            if text: content.append({"type": "blockquote", "text": text})
-    return content
-
-def get_meta_content(soup, name=None, prop=None):
-    attrs = {}
-    if name: attrs["name"] = name
-    if prop: attrs["property"] = prop
-    tag = soup.find("meta", attrs=attrs)
-    return tag["content"].strip() if tag and tag.has_attr("content") else ""
-
-def _clean_html(html_content: str) -> str:
-    """Aggressively cleans HTML content by removing common non-article elements."""
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # Common selectors for elements to remove
-    cleaning_selectors = [
-        "script", "style", "noscript", "meta", "link", "svg", "img", # Remove common non-content tags
-        ".ad", ".advertisement", ".banner", ".comments", ".cookie-banner", ".footer",
-        ".header", ".nav", ".navbar", ".newsletter-signup", ".related-articles",
-        ".share-buttons", ".sidebar", ".social-links", ".popup", ".modal",
-        "aside", "footer", "header", "nav", "form", "iframe",
-        "[class*=\"ad\"], [id*=\"ad\"]", # Catch more generic ad classes/ids
-        "[class*=\"cookie\"], [id*=\"cookie\"]", # Catch more generic cookie classes/ids
-        "[class*=\"popup\"], [id*=\"popup\"]", # Catch more generic popup classes/ids
-        "[class*=\"banner\"], [id*=\"banner\"]", # Catch more generic banner classes/ids
-    ]
-
-    for selector in cleaning_selectors:
-        for element in soup.select(selector):
-            element.decompose()
-
-    return str(soup)
-
-def _validate_and_log_text(text: str, url: str, min_length: int) -> str:
+def _clean_html(tree) -> None:
+    """
+    Aggressively cleans the parsed page in place by removing common non-article elements.
+    One walk over the tree; a removed element's subtree is never visited.
+    """
+    hits = Counter()
+    doomed = []
+    stack = [tree]
+    while stack:
+        for child in stack.pop():
+            if not isinstance(child.tag, str):
+                continue  # Comments and processing instructions
+            rule = None if child.tag in _PROTECTED_TAGS else _cleaning_rule(child)
+            if rule:
+                hits[rule] += 1
+                doomed.append(child)
+            else:
+                stack.append(child)
+    for element in doomed:
+        element.drop_tree()
+    with _cleaner_hits_lock:
+        _cleaner_hits.update(hits)
+    if hits:
+        logger.debug(f"Cleaning removed {len(doomed)} element(s): {dict(hits)}")
+
+def _validate_and_log_text(text: str, url: str, min_length: int, log_extra: dict = None) -> str:
     if not text or not text.strip():
         raise ExtractionError("Extracted text is empty or only whitespace.")
     if len(text) < min_length:
@@ -165,97 +335,79 @@ def _validate_and_log_text(text: str, url: str, min_length: int) -> str:
         raise ExtractionError("Extracted text appears to be HTML, not clean text.")
     return text
 
-def _extract_with_newspaper(html_content: str, url: str) -> dict:
-    article = NewspaperArticle(url, language='en')
-    article.download(input_html=html_content)
-    article.parse()
-    return { "text": article.text, "title": article.title, "author": ", ".join(article.authors), "structured_text": [{"type": "p", "text": p.strip()} for p in article.text.split('\n') if p.strip()] }
-
-def _extract_with_trafilatura(html_content: str, url: str) -> dict:
-    if html_content is None:
-        raise ExtractionError("No HTML content provided for trafilatura.")
-    new_config = use_config()
-    new_config.set("DEFAULT", "MIN_EXTRACTED_SIZE", "150")
-    new_config.set("DEFAULT", "MIN_OUTPUT_SIZE", "100")
-    text = trafilatura.extract(html_content, config=new_config, include_comments=False, include_tables=False, deduplicate=True)
-    return { "text": text, "structured_text": [{"type": "p", "text": p.strip()} for p in text.split('\n') if p.strip()] }
-
-def _extract_with_readability(html_content: str, url: str) -> dict:
-    doc = Document(html_content)
-    summary_html = doc.summary()
-    text_parts = []
-    structured_content = _parse_structured_content(summary_html)
-    for item in structured_content:
-        if item['type'] in ['p', 'blockquote'] or item['type'].startswith('h'):
-            text_parts.append(item['text'])
-        elif item['type'] in ['ul', 'ol']:
-            text_parts.extend(item['items'])
-    return { "text": "\n\n".join(text_parts), "title": doc.short_title(), "structured_text": structured_content }
-
-def _extract_with_domain_specific_rules(html_content: str, url: str) -> dict | None:
-    soup = BeautifulSoup(html_content, "html.parser")
-    domain = urlparse(url).netloc.replace("www.", "").lower()
-
-    text = ""
-    structured_text = []
-    source_lib = "domain_specific"
-
-    extractor = DOMAIN_RULES.get(domain)
-
-    if extractor:
-        try:
-            main_content = extractor(url, soup)
-            if main_content is None:
-                raise ExtractionError(f"Domain-specific extractor for {domain} returned None.")
-            if main_content:
-                paragraphs = main_content.find_all("p")
-                if paragraphs:
-                    text = " ".join(p.get_text().strip() for p in paragraphs)
-                    structured_text = _parse_structured_content(str(main_content))
-                    logger.info(f"Extracted with domain-specific rule for {domain} for {url}")
-        except Exception as e:
-            logger.warning(f"Domain-specific extractor failed for {domain}: {e}")
+def _extract_with_domain_specific_rules(page: ParsedPage, url: str) -> dict | None:
+    """
+    Applies the site's selector rule (see selector_rules). A hand-written rule that matches is
+    trusted like complete structured data, so the cascade stops there.
+    """
+    rule = find_selector_rule(url)
+    if rule is None:
+        return None
+    result = rule["compiled"].extract(page.tree)
+    if result is None:
+        raise ExtractionError(f"Content selector '{rule['content_selector']}' matched nothing.")
+    logger.info(f"Extracted with selector rule {rule.get('id') or rule['pattern']} for {url}")
+    result["complete"] = True
+    return result
 
-    if text:
-        return {"text": text, "structured_text": structured_text, "source_lib": source_lib}
-    return None
+# A complete structured body should hold at least this share of the cleaned page's text; less is a teaser
+_STRUCTURED_MIN_COVERAGE = 0.3
 
-from playwright.sync_api import sync_playwright
+def _extract_with_structured_data(page: ParsedPage, url: str) -> dict | None:
+    """
+    The article body publishers embed for search engines: JSON-LD articleBody, or the element
+    marked itemprop="articleBody". The result is marked complete when a headline and an author
+    or date came with it and the body looks whole, which lets it skip the heavier extractors.
+    """
+    data = page.structured_data or {}
+    body = data.get("body", "")
+    if body:
+        if _MARKUP_RE.search(body):
+            structured_text = parse_structured_content(lxml.html.fragment_fromstring(body, create_parent="div"))
+        else:
+            structured_text = [{"type": "p", "text": p.strip()} for p in body.split("\n") if p.strip()]
+    else:
+        element = _first(page.tree.xpath("//*[@itemprop='articleBody']"))
+        if element is None:
+            return None
+        structured_text = parse_structured_content(element)
+        if not structured_text:
+            structured_text = [{"type": "p", "text": " ".join(element.text_content().split())}]
+    text = text_from_blocks(structured_text)
+    if not text:
+        return None
 
-def extract_with_playwright(url: str, soup=None) -> dict:
+    page_text_length = len(page.tree.text_content())
+    complete = bool(
+        data.get("headline") and (data.get("author") or data.get("date_published"))
+        and not text.rstrip().endswith(("...", "\u2026"))
+        and len(text) >= _STRUCTURED_MIN_COVERAGE * page_text_length
+        # One unbroken blob reads badly in the player; let the other extractors find the paragraphs
+        and (len(structured_text) > 1 or len(text) < 1500)
+    )
+    logger.info(f"Found {'complete' if complete else 'partial'} structured article data ({len(text)} chars) for {url}")
+    return {"text": text, "structured_text": structured_text, "complete": complete}
+
+def _extract_rendered(page: ParsedPage, url: str) -> dict:
+    """Renders the article in the shared headless browser. Must run on the Playwright thread."""
     logger.info(f"Attempting extraction with Playwright for {url}")
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url, timeout=30000) # 30 seconds timeout
-            html = page.content()
-            if not html or not isinstance(html, str) or "<html" not in html.lower():
-                raise ExtractionError("Playwright returned invalid HTML or binary data.")
-            browser.close()
-            
-            # Use BeautifulSoup to parse the HTML and extract text/structured content
-            soup = BeautifulSoup(html, "html.parser")
-            text_parts = []
-            structured_content = _parse_structured_content(html)
-            for item in structured_content:
-                if item['type'] in ['p', 'blockquote'] or item['type'].startswith('h'):
-                    text_parts.append(item['text'])
-                elif item['type'] in ['ul', 'ol']:
-                    text_parts.extend(item['items'])
-            
-            title = get_meta_content(soup, prop="og:title") or (soup.title.string if soup.title else "")
-            author = get_meta_content(soup, name="author") or get_meta_content(soup, prop="article:author")
-
-            return {
-                "text": "\n\n".join(text_parts),
-                "title": title,
-                "author": author,
-                "structured_text": structured_content
-            }
-    except Exception as e:
-        logger.error(f"Playwright extraction failed for {url}: {e}", exc_info=True)
-        return {"text": "", "title": "", "author": "", "structured_text": [], "error": str(e)}
+    html = get_browser_pool().render(url, page.source_html if page is not None else None)
+    if not html or not isinstance(html, str) or "<html" not in html.lower():
+        raise ExtractionError("Playwright returned invalid HTML or binary data.")
+
+    # Parse the rendered HTML once and extract text/structured content from the tree
+    tree = _parse_html(html)
+    structured_content = parse_structured_content(tree)
+
+    title = get_meta_content(tree, prop="og:title") or _get_title(tree)
+    author = get_meta_content(tree, name="author") or get_meta_content(tree, prop="article:author")
+
+    return {
+        "text": text_from_blocks(structured_content),
+        "title": title,
+        "author": author,
+        "structured_text": structured_content
+    }
 
 def _choose_best_extraction(results: list) -> dict:
 
@@ -280,51 +432,280 @@ def _choose_best_extraction(results: list) -> dict:
     # 3. Final Fallback: return the one with the longest text
     return max(results, key=lambda r: len(r.get("text", "")))
 
+# Where each extractor runs, which also sets its tier: "pool" functions take (html, url) in an extractor process,
+# "inline" ones take (page, url) on the request thread, "browser" ones run on the Playwright thread.
 extraction_methods = [
-    ("newspaper3k", _extract_with_newspaper),
-    ("trafilatura", _extract_with_trafilatura),
-    ("readability", _extract_with_readability),
-    ("domain_specific", _extract_with_domain_specific_rules),
-    ("playwright", extract_with_playwright),
+    ("structured_data", _extract_with_structured_data, "inline"),
+    ("newspaper3k", extract_with_newspaper, "pool"),
+    ("trafilatura", extract_with_trafilatura, "pool"),
+    ("readability", extract_with_readability, "pool"),
+    ("domain_specific", _extract_with_domain_specific_rules, "inline"),
+    ("playwright", _extract_rendered, "browser"),
 ]
 
-def extract_article(url: str, log_extra: dict = None) -> dict:
+def _score_extraction(result: dict, page_text_length: int, title: str = "", author: str = "") -> float:
+    """
+    Confidence in [0, 1] that an extraction is the whole article: how much of the cleaned page's
+    text it kept, whether that text reads as prose paragraphs, whether a title and author are
+    known, and a penalty for replacement characters left by bad decoding.
+    """
+    text = result.get("text", "")
+    if not text:
+        return 0.0
+    length = len(text)
+    coverage = min(1.0, length / (page_text_length * 0.5)) if page_text_length else 0.0
+    length_score = min(1.0, length / 2000)
+    blocks = [b.get("text", "") for b in result.get("structured_text") or [] if b.get("type") == "p"]
+    if not blocks:
+        blocks = text.split("\n")
+    # Expect a real paragraph (not a nav link or caption) for every ~600 characters of text
+    prose_paragraphs = sum(1 for block in blocks if len(block.strip()) >= 40)
+    density = min(1.0, prose_paragraphs / max(1.0, length / 600))
+    has_title = bool(result.get("title") or title)
+    has_author = bool(result.get("author") or author)
+    score = 0.3 * coverage + 0.2 * length_score + 0.25 * density + 0.15 * has_title + 0.1 * has_author
+    replacement_ratio = text.count('\ufffd') / length
+    return round(score * max(0.0, 1.0 - 10 * replacement_ratio), 3)
+
+# Names older versions of the admin form stored for preferred_extractor
+_EXTRACTOR_ALIASES = {"readability-lxml": "readability"}
+
+# Cheapest first: once a tier yields a confident result, later tiers never start
+_EXTRACTOR_TIERS = ("inline", "pool", "browser")
+
+# Why an inline extractor that returns None was skipped
+_INLINE_SKIP_REASONS = {
+    "structured_data": "skipped: no structured article data",
+    "domain_specific": "skipped: no selector rule for the site",
+}
+
+def _run_extractors(page: ParsedPage, url: str, methods: list, step_status: dict, log_extra: dict, title: str = "", author: str = "", latencies: dict = None) -> list:
+    """
+    Runs the extractors tier by tier, starting every extractor in a tier at once and validating
+    results in the order they arrive. Each success is scored; one that clears
+    EXTRACTION_CONFIDENCE_THRESHOLD ends the cascade and the rest are recorded as skipped.
+    An extractor's timeout runs from when it actually starts, not from when it was queued behind
+    other requests' jobs; one still waiting after EXTRACTOR_QUEUE_TIMEOUT is failed instead.
+    A pool job that overruns has its process killed; the other pool jobs are left alone.
+    Seconds spent by each extractor that finished or timed out are added to latencies. An inline
+    extractor that returns None had nothing to work with and is recorded as skipped.
+    """
+    if latencies is None:
+        latencies = {}
+    pool = get_extractor_pool()
+    page_text_length = len(page.tree.text_content())
+    successful_extractions = []
+    confident = None
+
+    for tier in _EXTRACTOR_TIERS:
+        tier_methods = [m for m in methods if m[2] == tier]
+        if not tier_methods:
+            continue
+        if confident:
+            for name, _, _ in tier_methods:
+                step_status[name] = f"skipped: {confident} cleared the confidence threshold"
+            continue
+
+        # ("start", name, wall-clock start) when a job begins running, ("done", name, (result, error)) when it ends
+        results = queue.Queue()
+        submitted = time.monotonic()
+        deadlines = {name: submitted + EXTRACTOR_QUEUE_TIMEOUT for name, _, _ in tier_methods}
+        started = {}
+        cancel = {} # name -> callable abandoning the job
+
+        def _on_start(name):
+            return lambda started_at: results.put(("start", name, started_at))
+
+        def _deliver(name):
+            return lambda result, error: results.put(("done", name, (result, error)))
+
+        def _deliver_future(name):
+            return lambda future: None if future.cancelled() else results.put(("done", name, (None, future.exception()) if future.exception() else (future.result(), None)))
+
+        def _browser_job(name, func):
+            def run(page, url):
+                results.put(("start", name, time.time()))
+                return func(page, url)
+            return run
+
+        for name, func, where in tier_methods:
+            logger.debug(f"Starting extraction with {name} for {url}")
+            if where == "pool":
+                job_id = pool.submit(func, page.html, url, _deliver(name), _on_start(name))
+                cancel[name] = lambda job_id=job_id: pool.cancel(job_id)
+            elif where == "browser":
+                future = _playwright_executor.submit(_browser_job(name, func), page, url)
+                future.add_done_callback(_deliver_future(name))
+                cancel[name] = future.cancel # A render in progress can't be interrupted; it runs to its own timeout
+            else:
+                results.put(("start", name, time.time()))
+                try:
+                    extracted_data = func(page, url)
+                except Exception as e:
+                    results.put(("done", name, (None, e)))
+                    continue
+                if extracted_data is None:
+                    # Nothing on this page for it to read; neither a failure nor an attempt worth timing
+                    step_status[name] = _INLINE_SKIP_REASONS.get(name, "skipped: nothing to extract")
+                    del deadlines[name]
+                    continue
+                results.put(("done", name, (extracted_data, None)))
+
+        pending = set(deadlines)
+        while pending and not confident:
+            wait_for = max(0.0, min(deadlines[name] for name in pending) - time.monotonic())
+            try:
+                kind, name, payload = results.get(timeout=wait_for)
+            except queue.Empty:
+                now = time.monotonic()
+                for name in [name for name in pending if deadlines[name] <= now]:
+                    pending.discard(name)
+                    cancel.get(name, lambda: None)()
+                    if name in started:
+                        limit = EXTRACTOR_TIMEOUTS.get(name, EXTRACTOR_TIMEOUT)
+                        logger.warning(f"{name} extraction timed out after {limit:.0f}s for {url}", extra=log_extra)
+                        step_status[name] = f"failed: timed out after {limit:.0f}s"
+                        latencies[name] = limit
+                    else:
+                        logger.warning(f"{name} extraction never started within {EXTRACTOR_QUEUE_TIMEOUT:.0f}s for {url}", extra=log_extra)
+                        step_status[name] = f"failed: not started within {EXTRACTOR_QUEUE_TIMEOUT:.0f}s (extractors busy)"
+                continue
+            if name not in pending:
+                continue
+            if kind == "start":
+                # Convert the worker's wall-clock start to this process's monotonic clock
+                started[name] = time.monotonic() - max(0.0, time.time() - payload)
+                deadlines[name] = started[name] + EXTRACTOR_TIMEOUTS.get(name, EXTRACTOR_TIMEOUT)
+                continue
+            extracted_data, error = payload
+            pending.discard(name)
+            latencies[name] = time.monotonic() - started.get(name, submitted)
+            try:
+                if error is not None:
+                    raise error
+                if not extracted_data:
+                    raise ExtractionError("Extractor returned no result.")
+                if extracted_data.get("error"):
+                    raise ExtractionError(extracted_data["error"])
+                validated_text = _validate_and_log_text(extracted_data.get("text", ""), url, MIN_EXTRACTED_TEXT_LENGTH, log_extra)
+                extracted_data["text"] = validated_text
+                extracted_data["source_lib"] = name
+                # Complete structured data and selector rule matches are trusted outright; nothing scores higher
+                score = 1.0 if extracted_data.pop("complete", False) else _score_extraction(extracted_data, page_text_length, title, author)
+                extracted_data["confidence"] = score
+                successful_extractions.append(extracted_data)
+                step_status[name] = f"success (score {score:.2f})"
+                logger.info(f"Successfully extracted content with {name} for {url} after {latencies[name]:.1f}s, score {score:.2f}.", extra=log_extra)
+                if score >= EXTRACTION_CONFIDENCE_THRESHOLD:
+                    confident = name
+            except Exception as e:
+                logger.warning(f"{name} extraction failed for {url}: {e}", extra=log_extra)
+                step_status[name] = f"failed: {e}"
+
+        # Nobody will read these results; free the pool for other requests
+        for name in pending:
+            cancel.get(name, lambda: None)()
+            step_status[name] = f"skipped: {confident} cleared the confidence threshold"
+
+    if confident:
+        skipped = [name for name, _, _ in methods if step_status.get(name, "") == f"skipped: {confident} cleared the confidence threshold"]
+        if skipped:
+            step_status["early_exit"] = f"skipped {', '.join(skipped)} after {confident} scored at least {EXTRACTION_CONFIDENCE_THRESHOLD:.2f}"
+            logger.info(f"Early exit for {url}: {step_status['early_exit']}", extra=log_extra)
+    return successful_extractions
+
+def _static_word_count(page_url: str, log_extra: dict) -> int:
+    """Word count of the best extraction of a page without the headless browser; 0 if none succeeds."""
+    fetched = fetcher.fetch(page_url, _get_randomized_headers(page_url), REQUEST_TIMEOUT, log_extra)
+    page = ParsedPage(fetched.text, page_url)
+    page.structured_data = _read_structured_data(page.tree)
+    _clean_html(page.tree)
+    page.mark_modified()
+    methods = [m for m in extraction_methods if m[2] != "browser"]
+    best = _choose_best_extraction(_run_extractors(page, page_url, methods, {}, log_extra))
+    return len(best["text"].split()) if best else 0
+
+def _probe_alternate(domain: str, other_url: str, words: int, other_is_alternate: bool, log_extra: dict):
+    """Extracts the article's other version (AMP or full) and records whether the AMP one held up."""
+    try:
+        try:
+            other_words = _static_word_count(other_url, log_extra)
+        except Exception as e:
+            if not other_is_alternate:
+                raise
+            logger.info(f"AMP alternate {other_url} could not be fetched: {e}", extra=log_extra)
+            other_words = 0
+        amp_words, full_words = (other_words, words) if other_is_alternate else (words, other_words)
+        good = amp_words > 0 and amp_words >= _ALTERNATE_MIN_WORD_RATIO * full_words
+        logger.info(f"AMP alternate for {domain} {'held up' if good else 'fell short'}: {amp_words} words against {full_words} on the full page.", extra=log_extra)
+        extractor_stats.record_alternate(domain, good, log_extra)
+    except Exception as e:
+        logger.warning(f"Could not compare the AMP alternate for {domain} using {other_url}: {e}", extra=log_extra)
+    finally:
+        _alternate_probe_slot.release()
+
+def _maybe_probe_alternate(domain: str, verdict: str, other_url: str, words: int, other_is_alternate: bool, log_extra: dict):
+    """
+    Every extraction samples while a domain's verdict is unknown; afterwards ALTERNATE_PROBE_RATE
+    of them keep it current. Either way a domain is compared at most once per ALTERNATE_PROBE_INTERVAL.
+    """
+    if verdict != "unknown" and random.random() >= ALTERNATE_PROBE_RATE:
+        return
+    now = time.monotonic()
+    with _alternate_probed_lock:
+        last = _alternate_probed.get(domain)
+        if last is not None and now - last < ALTERNATE_PROBE_INTERVAL:
+            return
+        if not _alternate_probe_slot.acquire(blocking=False):
+            return # A comparison is already running in this process
+        _alternate_probed[domain] = now
+        _alternate_probed.move_to_end(domain)
+        while len(_alternate_probed) > _ALTERNATE_PROBE_MAX_DOMAINS:
+            _alternate_probed.popitem(last=False)
+    _alternate_probe_executor.submit(_probe_alternate, domain, other_url, words, other_is_alternate, dict(log_extra))
+
+def extract_article(url: str, log_extra: dict = None, cache_mode: str = fetcher.CACHE_DEFAULT, use_alternate: bool = True) -> dict:
+    """
+    Fetches and extracts an article. cache_mode is passed to fetcher.fetch: "refresh" ignores the
+    fetch cache and "offline" replays the extraction entirely from it, without Playwright (which
+    would load the page's subresources) and without adding to the extractor stats.
+    On domains whose AMP pages have proven as good as the full ones, the AMP page is extracted
+    instead, unless use_alternate is False.
+    """
     if log_extra is None:
         log_extra = {}
     logger.info(f"📰 Attempting to extract article from URL: {url}", extra=log_extra)
     step_status = {"fetch": "pending", "newspaper3k": "pending", "trafilatura": "pending", "readability": "pending"}
-    html_content, last_modified_header, etag_header, canonical_url = "", "", "", ""
+    last_modified_header, etag_header, canonical_url = "", "", ""
     error_context, used_rule_id = None, None
     domain = urlparse(url).netloc
+    stats_domain = extractor_stats.stats_domain(domain)
     resp = None
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def _fetch_url_with_retries(current_url, current_log_extra):
-        request_headers = _get_randomized_headers(current_url)
-        resp = requests.get(current_url, headers=request_headers, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        return resp
+    # Offline replay only has the pages that were fetched, which may not include the AMP one
+    alternate_verdict = extractor_stats.alternate_verdict(stats_domain) if ALTERNATE_FETCH_ENABLED and cache_mode != fetcher.CACHE_OFFLINE else None
+    prefer_alternate = use_alternate and alternate_verdict == "good"
 
     try:
-        resp = _fetch_url_with_retries(url, log_extra)
-        status_code, content_type, content_length = resp.status_code, resp.headers.get("Content-Type", "unknown").lower(), len(resp.content)
-        canonical_url = resp.url # Capture the final URL after redirects
-        logger.info(f"Fetched {url} (Canonical: {canonical_url}) | Status: {status_code}, Content-Type: {content_type}, Length: {content_length} bytes", extra=log_extra)
-
-        # Advanced Content-Type Handling
-        if not content_type.startswith("text/html"):
-            raise ExtractionError(f"Unsupported content type: '{content_type}'. Expected HTML.")
+        if cache_mode == fetcher.CACHE_OFFLINE:
+            # A cache miss won't turn into a hit on retry
+            resp = fetcher.fetch(url, {}, REQUEST_TIMEOUT, log_extra, cache_mode)
+        else:
+            resp = fetcher.fetch_with_retries(url, _get_randomized_headers(url), REQUEST_TIMEOUT, log_extra, cache_mode, prefer_alternate)
+        # The fetcher has already rejected non-HTML and oversized responses
+        status_code, content_type, content_length = resp.status_code, resp.headers.get("Content-Type", "unknown").lower(), resp.size_bytes
+        canonical_url = resp.url if not resp.alternate_of else url # Capture the final URL after redirects
+        alternate_url, alternate_of = resp.alternate_url, resp.alternate_of
+        fetched_url = resp.url
+        logger.info(f"Fetched {url} (Canonical: {canonical_url}) | Status: {status_code}, Content-Type: {content_type}, Length: {content_length} bytes{' (from cache)' if resp.from_cache else ''}{f' (AMP page {resp.url})' if alternate_of else ''}", extra=log_extra)
         if content_length < 2048:
             logger.warning(f"Response body for {url} is unusually short ({content_length} bytes).", extra=log_extra)
 
-        html_content = resp.text
         last_modified_header, etag_header = resp.headers.get("Last-Modified", ""), resp.headers.get("ETag", "")
-        step_status["fetch"] = "success"
+        step_status["fetch"] = f"success (AMP page {resp.url})" if alternate_of else "success"
 
-        # Pre-extraction HTML Cleaning
-        cleaned_html_content = _clean_html(html_content)
-        logger.info(f"HTML cleaned. Original size: {len(html_content)} bytes, Cleaned size: {len(cleaned_html_content)} bytes", extra=log_extra)
-        html_content = cleaned_html_content # Use cleaned content for extraction
+        # Parse once; every later stage works on this tree. The page keeps the only reference to the text.
+        page = ParsedPage(resp.text, url)
+        resp = None
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Network error fetching {url}: {e}", exc_info=True, extra=log_extra)
@@ -334,55 +715,104 @@ def extract_article(url: str, log_extra: dict = None) -> dict:
         if isinstance(e, ExtractionError): raise
         return { "url": url, "title": "", "author": "", "text": "", "structured_text": [], "publish_date": "", "source": "fetch_error", "error": f"fetch_error: {e}", "last_modified": "", "etag": "", "extract_status": step_status, "used_rule_id": None, "canonical_url": url }
 
-    soup = BeautifulSoup(html_content, "html.parser")
-    title = get_meta_content(soup, prop="og:title") or (soup.title.string if soup.title else "")
-    author = get_meta_content(soup, name="author") or get_meta_content(soup, prop="article:author")
-    date_str_meta = get_meta_content(soup, prop="article:published_time") or get_meta_content(soup, name="publish_date") or get_meta_content(soup, name="datePublished")
+    # Metadata comes from the page before cleaning, which strips <meta>, <link> and <script> tags.
+    # The article's own structured data is the most precise source; meta tags fill the gaps.
+    tree = page.tree
+    structured = page.structured_data = _read_structured_data(tree)
+    title = structured.get("headline") or get_meta_content(tree, prop="og:title") or _get_title(tree)
+    author = structured.get("author") or get_meta_content(tree, name="author") or get_meta_content(tree, prop="article:author")
+    date_str_meta = structured.get("date_published") or get_meta_content(tree, prop="article:published_time") or get_meta_content(tree, name="publish_date") or get_meta_content(tree, name="datePublished")
     publish_date = ""
     if date_str_meta:
         try:
             publish_date = date_parser.isoparse(date_str_meta).isoformat()
-        except (date_parser.ParserError, TypeError) as e:
+        except (date_parser.ParserError, TypeError, ValueError) as e:
             logger.warning(f"Could not parse date string '{date_str_meta}': {e}", extra=log_extra)
     
-    icon_tag = soup.find("link", rel=lambda x: x and "icon" in x.lower())
-    raw_icon_href = icon_tag["href"] if icon_tag and icon_tag.has_attr("href") else ""
+    icon_tag = next((link for link in tree.iter("link") if "icon" in (link.get("rel") or "").lower()), None)
+    raw_icon_href = icon_tag.get("href", "") if icon_tag is not None else ""
     favicon_url = urljoin(url, raw_icon_href) if raw_icon_href else ""
-    publisher = get_meta_content(soup, prop="og:site_name") or domain
-    section = get_meta_content(soup, prop="article:section")
-    description = get_meta_content(soup, name="description") or get_meta_content(soup, prop="og:description")
-    image_url = get_meta_content(soup, prop="og:image") or get_meta_content(soup, name="twitter:image")
-
-    rules = _get_extraction_rules()
-    matching_rule = _find_matching_rule(url, domain, rules)
-    
-    extraction_methods_to_run = extraction_methods
+    publisher = get_meta_content(tree, prop="og:site_name") or structured.get("publisher") or domain
+    section = get_meta_content(tree, prop="article:section") or structured.get("section", "")
+    description = get_meta_content(tree, name="description") or get_meta_content(tree, prop="og:description") or structured.get("description", "")
+    image_url = get_meta_content(tree, prop="og:image") or get_meta_content(tree, name="twitter:image") or structured.get("image", "")
+
+    # Scripts and noscript blocks are still in the tree here; cleaning removes them
+    needs_js, rendering_reason = _needs_javascript(tree, len(page.source_html))
+
+    # Pre-extraction HTML cleaning, in place on the shared tree
+    original_size = content_length
+    _clean_html(tree)
+    page.mark_modified()
+    logger.info(f"HTML cleaned in place. Original size: {original_size} bytes", extra=log_extra)
+
+    matching_rule = find_matching_rule(url)
+    selector_rule = find_selector_rule(url)
+    # Without a selector rule for the site there is nothing for domain_specific to do
+    available_methods = [m for m in extraction_methods if selector_rule or m[0] != "domain_specific"]
+
+    extraction_methods_to_run = available_methods
     if matching_rule:
         used_rule_id = matching_rule["id"]
-        preferred = matching_rule["preferred_extractor"]
+        preferred = _EXTRACTOR_ALIASES.get(matching_rule["preferred_extractor"], matching_rule["preferred_extractor"])
         logger.info(f"Found matching rule {used_rule_id}: Forcing use of '{preferred}' for {url}.")
         preferred_method = next((m for m in extraction_methods if m[0] == preferred), None)
         if preferred_method:
             extraction_methods_to_run = [preferred_method]
+            # A site's selector rule still gets the first look; the pinned extractor runs if it matches nothing
+            if selector_rule and preferred != "domain_specific":
+                extraction_methods_to_run.insert(0, next(m for m in extraction_methods if m[0] == "domain_specific"))
         else:
             logger.warning(f"Rule {used_rule_id} specified an unknown extractor '{preferred}'. Falling back.")
 
-    successful_extractions = []
-    for name, func in extraction_methods_to_run:
-        logger.debug(f"Attempting extraction with {name} for {url}")
-        try:
-            extracted_data = func(html_content, url)
-            validated_text = _validate_and_log_text(extracted_data.get("text", ""), url, MIN_EXTRACTED_TEXT_LENGTH)
-            extracted_data["text"] = validated_text
-            extracted_data["source_lib"] = name
-            successful_extractions.append(extracted_data)
-            step_status[name] = "success"
-            logger.info(f"Successfully extracted content with {name} for {url}.", extra=log_extra)
-        except Exception as e:
-            logger.warning(f"{name} extraction failed for {url}: {e}", extra=log_extra)
-            step_status[name] = f"failed: {e}"
+    # Without an admin rule, let what has worked on this domain before shape the cascade
+    rule_pinned = extraction_methods_to_run is not available_methods
+    auto_pinned = None
+    if not rule_pinned:
+        ranked, auto_pinned, ranking_note = extractor_stats.rank_extractors(stats_domain, [m[0] for m in available_methods])
+        if ranking_note:
+            step_status["ranking"] = ranking_note
+            logger.info(f"Extractor ranking for {stats_domain}: {ranking_note}", extra=log_extra)
+            by_name = {m[0]: m for m in available_methods}
+            extraction_methods_to_run = [by_name[name] for name in ranked]
+
+    # Headless rendering is only worth its cost when the static HTML lacks the article.
+    # A pin (admin rule or learned) is honoured regardless.
+    def _gate_browser(methods):
+        if PLAYWRIGHT_MODE == "always" or (PLAYWRIGHT_MODE == "auto" and needs_js):
+            return methods
+        for name, _, where in methods:
+            if where == "browser":
+                step_status[name] = "skipped: disabled by PLAYWRIGHT_MODE" if PLAYWRIGHT_MODE == "never" else f"skipped: page is server-rendered ({rendering_reason})"
+        return [m for m in methods if m[2] != "browser"]
+
+    if not rule_pinned and not auto_pinned:
+        extraction_methods_to_run = _gate_browser(extraction_methods_to_run)
+    if cache_mode == fetcher.CACHE_OFFLINE:
+        for name, _, where in extraction_methods_to_run:
+            if where == "browser":
+                step_status[name] = "skipped: offline replay"
+        extraction_methods_to_run = [m for m in extraction_methods_to_run if m[2] != "browser"]
+    if not auto_pinned and not any(where == "browser" for _, _, where in extraction_methods_to_run):
+        page.source_html = None # Only the headless browser needed the uncleaned source
+    if needs_js:
+        logger.info(f"Page needs JavaScript to render ({rendering_reason}): {url}", extra=log_extra)
+
+    latencies = {}
+    successful_extractions = _run_extractors(page, url, extraction_methods_to_run, step_status, log_extra, title, author, latencies)
+    if not successful_extractions and auto_pinned:
+        step_status["ranking"] += "; it failed, so the full cascade ran"
+        fallback_methods = _gate_browser([m for m in available_methods if m[0] != auto_pinned and not (cache_mode == fetcher.CACHE_OFFLINE and m[2] == "browser")])
+        successful_extractions = _run_extractors(page, url, fallback_methods, step_status, log_extra, title, author, latencies)
 
     best_extraction = _choose_best_extraction(successful_extractions)
+    if not best_extraction and cache_mode != fetcher.CACHE_OFFLINE:
+        # Most likely a bot wall or consent page; a retry should fetch again, not be served this copy
+        fetcher.mark_extraction_failed(url, fetched_url)
+    if not best_extraction and alternate_of:
+        logger.warning(f"Nothing could be extracted from the AMP page for {url}; extracting the full page.", extra=log_extra)
+        extractor_stats.record_alternate(stats_domain, False, log_extra)
+        return extract_article(url, log_extra, cache_mode, use_alternate=False)
     
     if not best_extraction:
         error_context = "all_extractors_failed"
@@ -394,8 +824,14 @@ def extract_article(url: str, log_extra: dict = None) -> dict:
         source_lib = best_extraction.get("source_lib", "unknown")
         if best_extraction.get("title"): title = best_extraction["title"]
         if best_extraction.get("author"): author = best_extraction["author"]
+        if source_lib == "domain_specific":
+            used_rule_id = selector_rule.get("id") # None for a built-in rule
+    if cache_mode != fetcher.CACHE_OFFLINE:
+        extractor_stats.record_outcomes(stats_domain, step_status, best_extraction.get("source_lib") if best_extraction else None, latencies, log_extra)
 
     word_count = len(text.split()) if text else 0
+    if best_extraction and alternate_verdict and (alternate_of or alternate_url):
+        _maybe_probe_alternate(stats_domain, alternate_verdict, alternate_of or alternate_url, word_count, not alternate_of, log_extra)
     reading_time_min = max(1, word_count // 200) if word_count > 0 else 0
 
     return {
@@ -0,0 +1,144 @@
+"""
+Per-domain extractor statistics, learned from every extraction.
+
+Each domain has a document in the extractor_stats collection with, per extractor, counters for
+attempts, wins (its result was the one kept), failures and total latency. extract_article uses
+them to pin a domain's dominant extractor the way an admin rule would, or otherwise to drop the
+extractors that never win there. The extractors of a tier all start at once, so there is no
+order within a tier to tune. Latency is counted from when an extractor starts running.
+
+The same document counts how often the domain's AMP alternate, extracted on its own, held up
+against the full page. Once enough samples agree, articles there are fetched from the lighter AMP page.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from google.cloud import firestore
+
+from gcp import db
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_STATS_ENABLED = os.getenv("EXTRACTOR_STATS_ENABLED", "true").lower() == "true"
+# Outcomes a domain needs before its stats change the cascade
+EXTRACTOR_STATS_MIN_SAMPLES = int(os.getenv("EXTRACTOR_STATS_MIN_SAMPLES", "20"))
+# Win rate at which an extractor is pinned for its domain
+EXTRACTOR_AUTOPIN_WIN_RATE = float(os.getenv("EXTRACTOR_AUTOPIN_WIN_RATE", "0.8"))
+# Compared samples a domain's AMP alternate needs, and the share that must match the full page, before it is preferred
+ALTERNATE_MIN_SAMPLES = int(os.getenv("ALTERNATE_MIN_SAMPLES", "5"))
+ALTERNATE_GOOD_RATE = float(os.getenv("ALTERNATE_GOOD_RATE", "0.8"))
+
+_STATS_COLLECTION = "extractor_stats"
+_STATS_CACHE_TTL = 300 # 5 minutes
+_STATS_CACHE_MAX_DOMAINS = 1000
+_stats_cache = OrderedDict() # domain -> (fetched_at, stats document)
+_stats_cache_lock = threading.Lock() # Read from request threads and extractor threads alike
+
+def stats_domain(url_netloc: str) -> str:
+    return url_netloc.replace("www.", "").lower()
+
+def _get_domain_doc(domain: str) -> dict:
+    """Returns a domain's stats document ({"extractors": ..., "alternate": ...}), cached for a few minutes."""
+    now = time.time()
+    with _stats_cache_lock:
+        cached = _stats_cache.get(domain)
+        if cached and now - cached[0] < _STATS_CACHE_TTL:
+            _stats_cache.move_to_end(domain)
+            return cached[1]
+    # Read outside the lock; two threads missing on the same domain just both read it
+    try:
+        doc = db.collection(_STATS_COLLECTION).document(domain).get()
+        stats = (doc.to_dict() or {}) if doc.exists else {}
+    except Exception as e:
+        logger.warning(f"Could not read extractor stats for {domain}: {e}")
+        stats = cached[1] if cached else {}
+    with _stats_cache_lock:
+        _stats_cache[domain] = (now, stats)
+        _stats_cache.move_to_end(domain)
+        while len(_stats_cache) > _STATS_CACHE_MAX_DOMAINS:
+            _stats_cache.popitem(last=False)
+    return stats
+
+def _get_domain_stats(domain: str) -> dict:
+    """Returns {extractor: {attempts, wins, failures, latency_ms}} for a domain."""
+    return _get_domain_doc(domain).get("extractors", {})
+
+def rank_extractors(domain: str, names: list) -> tuple[list, str | None, str]:
+    """
+    Returns (names to run, in the given order, extractor to pin or None, a note for extract_status).
+    Without enough history for the domain the names come back unchanged.
+    """
+    if not EXTRACTOR_STATS_ENABLED:
+        return names, None, ""
+    stats = _get_domain_stats(domain)
+    total_wins = sum(s.get("wins", 0) for s in stats.values())
+    if total_wins < EXTRACTOR_STATS_MIN_SAMPLES:
+        return names, None, ""
+
+    def win_rate(name):
+        return stats.get(name, {}).get("wins", 0) / total_wins
+
+    def mean_latency(name):
+        s = stats.get(name, {})
+        return s.get("latency_ms", 0) / s["attempts"] if s.get("attempts") else float("inf")
+
+    best = min(names, key=lambda name: (-win_rate(name), mean_latency(name)))
+    best_stats = stats.get(best, {})
+    failure_rate = best_stats.get("failures", 0) / best_stats["attempts"] if best_stats.get("attempts") else 1.0
+    if win_rate(best) >= EXTRACTOR_AUTOPIN_WIN_RATE and failure_rate <= 1 - EXTRACTOR_AUTOPIN_WIN_RATE:
+        return [best], best, f"auto-pinned {best}: won {win_rate(best):.0%} of {total_wins} extractions"
+
+    # Extractors that have been tried here often enough and never won only cost time
+    kept = [name for name in names if win_rate(name) > 0 or stats.get(name, {}).get("attempts", 0) < EXTRACTOR_STATS_MIN_SAMPLES]
+    dropped = [name for name in names if name not in kept]
+    if not kept or not dropped:
+        return names, None, ""
+    return kept, None, f"dropped {', '.join(dropped)} (no wins in {total_wins} extractions)"
+
+def record_outcomes(domain: str, step_status: dict, winner: str | None, latencies: dict, log_extra: dict = None):
+    """Adds one extraction's outcomes to the domain's counters. Skipped extractors aren't counted."""
+    if not EXTRACTOR_STATS_ENABLED or not latencies:
+        return
+    update = {}
+    for name, seconds in latencies.items():
+        status = step_status.get(name, "")
+        update[name] = {
+            "attempts": firestore.Increment(1),
+            "wins": firestore.Increment(1 if name == winner else 0),
+            "failures": firestore.Increment(1 if status.startswith("failed") else 0),
+            "latency_ms": firestore.Increment(int(seconds * 1000)),
+        }
+    try:
+        db.collection(_STATS_COLLECTION).document(domain).set(
+            {"extractors": update, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True
+        )
+    except Exception as e:
+        logger.warning(f"Could not record extractor stats for {domain}: {e}", extra=log_extra)
+
+def alternate_verdict(domain: str) -> str | None:
+    """
+    "good" once the domain's AMP alternate has matched the full page often enough to be fetched
+    instead, "bad" if it hasn't, "unknown" while there are too few samples, None with stats disabled.
+    """
+    if not EXTRACTOR_STATS_ENABLED:
+        return None
+    alternate = _get_domain_doc(domain).get("alternate", {})
+    samples = alternate.get("samples", 0)
+    if samples < ALTERNATE_MIN_SAMPLES:
+        return "unknown"
+    return "good" if alternate.get("good", 0) / samples >= ALTERNATE_GOOD_RATE else "bad"
+
+def record_alternate(domain: str, good: bool, log_extra: dict = None):
+    """Adds one comparison of the domain's AMP alternate with its full page."""
+    if not EXTRACTOR_STATS_ENABLED:
+        return
+    try:
+        db.collection(_STATS_COLLECTION).document(domain).set({
+            "alternate": {"samples": firestore.Increment(1), "good": firestore.Increment(1 if good else 0)},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    except Exception as e:
+        logger.warning(f"Could not record alternate stats for {domain}: {e}", extra=log_extra)
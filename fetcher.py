@@ -0,0 +1,337 @@
+"""
+HTTP fetching for article extraction.
+
+All fetches in a process share one connection pool, so repeat fetches from a host reuse
+TCP/TLS connections. Each fetch still gets its own Session: cookies from one article
+(metered paywalls, consent walls) never leak into the next. Successful HTML responses that
+carry validators are kept in a small in-memory LRU. Refetching the same URL sends
+If-None-Match/If-Modified-Since, and a 304 is answered from the cached body.
+Behind that sits the on-disk PageCache. Within its TTL it answers fetches without any request,
+and it lets an extraction be replayed offline. A page nothing could be extracted from is marked
+as such, and is downloaded again the next time rather than served from the cache.
+
+Bodies are streamed. A response that isn't HTML, or that announces more than FETCH_MAX_BYTES,
+is rejected as soon as its headers arrive. The body is decoded chunk by chunk and abandoned
+once it passes the cap, so a link to a large PDF or video never lands in memory.
+
+The head is scanned for a <link rel="amphtml"> alternate as it streams in. With prefer_alternate
+the fetch stops right there and the much lighter AMP page is fetched instead.
+
+Every request goes through host_scheduler, which limits concurrent requests per host and fails
+fast while a site is blocking us. fetch_with_retries retries only what a retry can fix.
+"""
+import codecs
+import html
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from exceptions import ExtractionError
+from host_scheduler import polite_request, retry_after_seconds
+from page_cache import PageCache
+
+logger = logging.getLogger(__name__)
+
+# Hosts with pooled connections, and connections kept per host
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "32"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "8"))
+# Memory for bodies kept for conditional GETs; 0 disables them
+FETCH_VALIDATOR_CACHE_MAX_BYTES = int(os.getenv("FETCH_VALIDATOR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+_MAX_CACHED_BODY_BYTES = 5 * 1024 * 1024
+# The local tier is off unless given a directory; on Cloud Run the temp dir is memory, not disk
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "")
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 0 disables the local tier
+FETCH_CACHE_TTL = int(os.getenv("FETCH_CACHE_TTL", "3600"))  # Seconds a cached page is served without revalidating
+FETCH_CACHE_GCS_PREFIX = os.getenv("FETCH_CACHE_GCS_PREFIX", "")  # e.g. page-cache/; empty disables the GCS tier
+FETCH_CACHE_MAX_AGE = int(os.getenv("FETCH_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # Seconds before an entry is deleted outright; 0 keeps entries until evicted
+# Largest (decompressed) body accepted from a site
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+_STREAM_CHUNK_BYTES = 64 * 1024
+FETCH_MAX_ATTEMPTS = int(os.getenv("FETCH_MAX_ATTEMPTS", "3"))
+# A Retry-After longer than this isn't waited out on the request thread; the fetch fails instead
+FETCH_MAX_RETRY_AFTER = float(os.getenv("FETCH_MAX_RETRY_AFTER", "10"))
+_RETRY_BASE_SECONDS = 1.0
+_RETRY_MAX_SECONDS = 8.0
+_RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# cache_mode values for fetch(): use the cache normally, ignore what it holds, or never touch the network
+CACHE_DEFAULT, CACHE_REFRESH, CACHE_OFFLINE = "default", "refresh", "offline"
+
+# Describe the bytes on the wire, not the decoded body we keep
+_UNCACHED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie"}
+
+_CHARSET_HEADER_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_CHARSET_META_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_LINK_TAG_RE = re.compile(rb"<link\b[^>]*>", re.IGNORECASE)
+_AMPHTML_REL_RE = re.compile(rb"\brel\s*=\s*[\"']?[^\"'>]*\bamphtml\b", re.IGNORECASE)
+_HREF_RE = re.compile(rb"\bhref\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+))", re.IGNORECASE)
+_HEAD_END_RE = re.compile(rb"</head\s*>|<body\b", re.IGNORECASE)
+_MAX_HEAD_BYTES = 256 * 1024  # Stop looking for the alternate link if the head is longer than this
+
+class FetchedPage(NamedTuple):
+    url: str  # Final URL, after redirects
+    text: str
+    headers: CaseInsensitiveDict
+    size_bytes: int  # Decompressed body size
+    from_cache: bool
+    status_code: int = 200
+    alternate_url: str = ""  # AMP version advertised in the page's head
+    alternate_of: str = ""  # Set when this is the AMP page, fetched in place of the URL asked for
+
+_adapter = HTTPAdapter(pool_connections=FETCH_POOL_HOSTS, pool_maxsize=FETCH_POOL_SIZE, max_retries=0)
+
+def _new_session() -> requests.Session:
+    """A cookie-isolated session on the shared connection pool. Don't close it: that would close the pool."""
+    session = requests.Session()
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    return session
+
+class _ValidatorCache:
+    """LRU of url -> (validators, body, headers), bounded by total body size."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, entry: dict):
+        body = entry["body"]
+        if self.max_bytes <= 0 or len(body) > min(self.max_bytes, _MAX_CACHED_BODY_BYTES):
+            return
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._total_bytes -= len(old["body"])
+            self._entries[url] = entry
+            self._total_bytes += len(body)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted["body"])
+
+    def pop(self, url: str):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._total_bytes -= len(old["body"])
+
+_validator_cache = _ValidatorCache(FETCH_VALIDATOR_CACHE_MAX_BYTES)
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def page_cache_enabled() -> bool:
+    """Whether fetched pages are kept on disk or in GCS, beyond the in-memory validator cache."""
+    return bool((FETCH_CACHE_DIR and FETCH_CACHE_MAX_BYTES > 0) or FETCH_CACHE_GCS_PREFIX)
+
+def _get_page_cache() -> PageCache:
+    global _page_cache
+    if _page_cache is None:
+        with _page_cache_lock:
+            if _page_cache is None:
+                import gcp
+                _page_cache = PageCache(FETCH_CACHE_DIR, FETCH_CACHE_MAX_BYTES, bucket=gcp.bucket, gcs_prefix=FETCH_CACHE_GCS_PREFIX, max_age=FETCH_CACHE_MAX_AGE)
+    return _page_cache
+
+def _detect_encoding(headers, first_bytes: bytes) -> str:
+    """Charset from a BOM or the Content-Type header, else from <meta charset>, else UTF-8."""
+    candidates = []
+    if first_bytes.startswith(codecs.BOM_UTF8):
+        candidates.append("utf-8-sig")
+    match = _CHARSET_HEADER_RE.search(headers.get("Content-Type", ""))
+    if match:
+        candidates.append(match.group(1))
+    match = _CHARSET_META_RE.search(first_bytes[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii", "ignore"))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+def _find_alternate(head: bytes, base_url: str) -> str:
+    """Absolute URL of the <link rel="amphtml"> in a page's head, or ""."""
+    for tag in _LINK_TAG_RE.finditer(head):
+        if _AMPHTML_REL_RE.search(tag.group(0)):
+            href = _HREF_RE.search(tag.group(0))
+            value = next((g for g in href.groups() if g), b"") if href else b""
+            if value.strip():
+                return urljoin(base_url, html.unescape(value.strip().decode("utf-8", "replace")))
+    return ""
+
+def _check_html(headers) -> None:
+    content_type = headers.get("Content-Type", "unknown").lower()
+    if not content_type.startswith("text/html"):
+        raise ExtractionError(f"Unsupported content type: '{content_type}'. Expected HTML.")
+
+def _page_from_cache(entry: dict, not_modified: requests.Response = None) -> FetchedPage:
+    """Rebuilds a page from a cached body, taking fresh headers from a 304 if there was one."""
+    headers = CaseInsensitiveDict(entry["headers"])
+    if not_modified is not None:
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires", "Date"):
+            if name in not_modified.headers:
+                headers[name] = not_modified.headers[name]
+    body = entry["body"]
+    encoding = entry.get("encoding") or _detect_encoding(headers, body[:4096])
+    text = body.decode(encoding, errors="replace")
+    head_end = _HEAD_END_RE.search(body, 0, _MAX_HEAD_BYTES)
+    alternate_url = _find_alternate(body[:head_end.start() if head_end else _MAX_HEAD_BYTES], entry["url"])
+    return FetchedPage(url=entry["url"], text=text, headers=headers, size_bytes=len(body), from_cache=True, alternate_url=alternate_url)
+
+def _read_body(resp: requests.Response, stop_at_alternate: bool = False) -> tuple[str | None, int, str]:
+    """
+    Streams and decodes the body, giving up once it passes FETCH_MAX_BYTES, and looks for an AMP
+    alternate in the head on the way. Returns (text, byte size, alternate URL); with
+    stop_at_alternate, text is None when an alternate turned up and the rest was never read.
+    """
+    declared = resp.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > FETCH_MAX_BYTES:
+        raise ExtractionError(f"Page is too large ({int(declared)} bytes; the limit is {FETCH_MAX_BYTES}).")
+    decoder, pieces, size = None, [], 0
+    head, alternate_url = b"", None
+    for chunk in resp.iter_content(chunk_size=_STREAM_CHUNK_BYTES):
+        size += len(chunk)
+        if size > FETCH_MAX_BYTES:
+            raise ExtractionError(f"Page is too large (over {FETCH_MAX_BYTES} bytes).")
+        if alternate_url is None:
+            head += chunk
+            head_end = _HEAD_END_RE.search(head)
+            if head_end or len(head) >= _MAX_HEAD_BYTES:
+                alternate_url = _find_alternate(head[:head_end.start()] if head_end else head, resp.url)
+                head = b""
+                if alternate_url and stop_at_alternate:
+                    return None, size, alternate_url
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(_detect_encoding(resp.headers, chunk))(errors="replace")
+        pieces.append(decoder.decode(chunk))
+    if decoder is not None:
+        pieces.append(decoder.decode(b"", final=True))
+    if alternate_url is None:
+        alternate_url = _find_alternate(head, resp.url)
+    return "".join(pieces), size, alternate_url
+
+def _store(url: str, page: FetchedPage):
+    """Caches the page as UTF-8, whatever it was served in."""
+    body = page.text.encode("utf-8")
+    if len(body) > _MAX_CACHED_BODY_BYTES:
+        return
+    headers = {k: v for k, v in page.headers.items() if k.lower() not in _UNCACHED_HEADERS}
+    if "ETag" in headers or "Last-Modified" in headers:
+        _validator_cache.put(url, {"body": body, "headers": headers, "url": page.url, "encoding": "utf-8", "fetched_at": time.time()})
+    _get_page_cache().put([url, page.url], body, headers, page.url, "utf-8")
+
+def mark_extraction_failed(*urls: str):
+    """
+    Flags the cached copies of urls as a page nothing could be extracted from (likely a bot wall
+    or a consent page). A retry then downloads it again in full instead of being served it for
+    FETCH_CACHE_TTL or revalidating it; offline replay still reads it.
+    """
+    urls = [url for url in urls if url]
+    for url in urls:
+        _validator_cache.pop(url)
+    _get_page_cache().mark_extraction_failed(urls)
+
+def fetch(url: str, headers: dict, timeout: float, log_extra: dict = None, cache_mode: str = CACHE_DEFAULT, prefer_alternate: bool = False) -> FetchedPage:
+    """
+    GETs an HTML page on the shared connection pool. A page cached within the TTL is returned as
+    is and an older copy is revalidated. CACHE_REFRESH always downloads; CACHE_OFFLINE only reads
+    the cache and raises ExtractionError on a miss. Raises requests.HTTPError for error statuses
+    and ExtractionError for non-HTML or oversized responses.
+    With prefer_alternate, a page whose head links an AMP version is abandoned there and the AMP
+    page is returned instead (with alternate_of set); if that fetch fails, the page is fetched as usual.
+    """
+    cached = None
+    if cache_mode != CACHE_REFRESH:
+        cached = _validator_cache.get(url) or _get_page_cache().get(url)
+    if cached is not None and cached.get("extraction_failed") and cache_mode != CACHE_OFFLINE:
+        cached = None # Whatever was served last time yielded no article
+    if cache_mode == CACHE_OFFLINE:
+        if cached is None and not page_cache_enabled():
+            raise ExtractionError(
+                f"{url} can't be replayed offline: the page cache is disabled (set FETCH_CACHE_DIR or FETCH_CACHE_GCS_PREFIX), "
+                "and only pages with an ETag or Last-Modified fetched by this worker are kept in memory."
+            )
+        if cached is None:
+            raise ExtractionError(f"{url} is not in the fetch cache, and offline replay can't download it.")
+        logger.info(f"Replaying {url} from the fetch cache ({len(cached['body'])} bytes).", extra=log_extra)
+        return _page_from_cache(cached)
+    if cached is not None and time.time() - cached.get("fetched_at", 0) < FETCH_CACHE_TTL:
+        logger.info(f"Serving {url} from the fetch cache ({len(cached['body'])} bytes).", extra=log_extra)
+        return _page_from_cache(cached)
+
+    request_headers = dict(headers)
+    if cached is not None:
+        if "ETag" in cached["headers"]:
+            request_headers["If-None-Match"] = cached["headers"]["ETag"]
+        if "Last-Modified" in cached["headers"]:
+            request_headers["If-Modified-Since"] = cached["headers"]["Last-Modified"]
+
+    # Leaving the block closes the response, so an abandoned body never goes back to the pool half-read
+    with polite_request(urlsplit(url).hostname), _new_session().get(url, headers=request_headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and cached is not None:
+            logger.info(f"{url} not modified; reusing {len(cached['body'])} cached bytes.", extra=log_extra)
+            page = _page_from_cache(cached, resp)
+            _store(url, page)
+            return page
+        resp.raise_for_status()
+        _check_html(resp.headers)
+        text, size, alternate_url = _read_body(resp, stop_at_alternate=prefer_alternate)
+        if text is None:
+            logger.info(f"Fetching the AMP alternate of {url} after {size} bytes: {alternate_url}", extra=log_extra)
+        else:
+            page = FetchedPage(url=resp.url, text=text, headers=resp.headers, size_bytes=size, from_cache=False, alternate_url=alternate_url)
+    if text is None:
+        try:
+            return fetch(alternate_url, headers, timeout, log_extra, cache_mode)._replace(alternate_of=url)
+        except (requests.RequestException, ExtractionError) as e:
+            logger.warning(f"AMP alternate {alternate_url} failed ({e}); fetching {url} in full.", extra=log_extra)
+            return fetch(url, headers, timeout, log_extra, cache_mode)
+    _store(url, page)
+    return page
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying after error, or None when another attempt can't help."""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        if status != 429 and status < 500:
+            return None # Other 4xx answers won't change on a retry
+        retry_after = retry_after_seconds(error.response)
+        if retry_after is not None:
+            return retry_after if retry_after <= FETCH_MAX_RETRY_AFTER else None
+    elif not isinstance(error, _RETRYABLE_ERRORS):
+        return None
+    return random.uniform(0, min(_RETRY_MAX_SECONDS, _RETRY_BASE_SECONDS * 2 ** attempt))
+
+def fetch_with_retries(url: str, headers: dict, timeout: float, log_extra: dict = None, cache_mode: str = CACHE_DEFAULT, prefer_alternate: bool = False) -> FetchedPage:
+    """
+    fetch(), retried with full-jitter backoff after connection errors, timeouts, 429s and 5xx
+    responses, honouring Retry-After. Other 4xx responses, ExtractionError (including an open
+    circuit breaker) and a Retry-After beyond FETCH_MAX_RETRY_AFTER fail at once.
+    """
+    for attempt in range(FETCH_MAX_ATTEMPTS):
+        try:
+            return fetch(url, headers, timeout, log_extra, cache_mode, prefer_alternate)
+        except (requests.RequestException, ExtractionError) as e:
+            delay = _retry_delay(e, attempt) if attempt + 1 < FETCH_MAX_ATTEMPTS else None
+            if delay is None:
+                raise
+            logger.warning(f"Fetch of {url} failed on attempt {attempt+1}/{FETCH_MAX_ATTEMPTS} ({e}); retrying in {delay:.1f}s.", extra=log_extra)
+        time.sleep(delay)
@@ -0,0 +1,164 @@
+"""
+Politeness controls for article fetches: a cap on concurrent requests per host, and a circuit
+breaker per site.
+
+Without a cap, a burst of submissions from one publisher opens as many parallel requests as
+there are workers, which is exactly what gets us rate-limited or blocked. The breaker counts
+responses that mean "go away" (403, 429, 5xx, refused or timed-out connections). After
+FETCH_BREAKER_THRESHOLD of them in a row it fails fetches to that site immediately for a
+cooldown, after which a single trial request decides whether to close it again. A Retry-After
+below the threshold only holds the site off for as long as it asks; it neither opens the
+breaker nor makes the next request a trial.
+"""
+import email.utils
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+import requests
+
+from exceptions import ExtractionError, FetchBlockedError
+
+logger = logging.getLogger(__name__)
+
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "2"))
+FETCH_HOST_SLOT_WAIT = float(os.getenv("FETCH_HOST_SLOT_WAIT", "30"))  # Seconds to wait for a free slot before giving up
+FETCH_BREAKER_THRESHOLD = int(os.getenv("FETCH_BREAKER_THRESHOLD", "5"))
+FETCH_BREAKER_COOLDOWN = float(os.getenv("FETCH_BREAKER_COOLDOWN", "300"))
+_BREAKER_MAX_SITES = 1000  # Sites with recent failures that are remembered
+
+_BLOCKING_STATUSES = {403, 429}
+
+def site_key(host: str) -> str:
+    host = (host or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def retry_after_seconds(response) -> float | None:
+    """Seconds asked for by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = (response.headers.get("Retry-After") or "").strip() if response is not None else ""
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_blocking_failure(error: Exception) -> bool:
+    """Whether a fetch error means the site is refusing or failing us, rather than answering."""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status in _BLOCKING_STATUSES or status >= 500
+    return isinstance(error, requests.RequestException)
+
+class _HostSlots:
+    """Caps in-flight requests per host. Hosts with nothing in flight take no memory."""
+    def __init__(self, per_host: int):
+        self.per_host = per_host
+        self._in_flight = Counter()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, host: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight[host] >= self.per_host:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ExtractionError(f"Too many fetches from {host} already in progress; gave up after {timeout:.0f}s.")
+                self._cond.wait(remaining)
+            self._in_flight[host] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight[host] -= 1
+                if self._in_flight[host] <= 0:
+                    del self._in_flight[host]
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._in_flight)
+
+class _CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._sites = OrderedDict()  # site -> {"failures", "open_until", "hold_until", "trial"}
+        self._lock = threading.Lock()
+
+    def before_request(self, site: str):
+        """Raises FetchBlockedError while the site's breaker is open. Once it cools down, lets one trial through."""
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None:
+                return
+            now = time.time()
+            if now < state["hold_until"]:
+                raise FetchBlockedError(f"{site} asked us to retry later; holding off for another {state['hold_until'] - now:.0f}s.")
+            if not state["open_until"]:
+                return
+            if now < state["open_until"]:
+                raise FetchBlockedError(f"{site} has been refusing our requests; not retrying for another {state['open_until'] - now:.0f}s.")
+            if state["trial"]:
+                raise FetchBlockedError(f"{site} has been refusing our requests; a trial request is in progress.")
+            state["trial"] = True
+
+    def record(self, site: str, error: Exception = None):
+        """Records the outcome of a request that got past before_request; error is None on success."""
+        with self._lock:
+            if error is None or not is_blocking_failure(error):
+                self._sites.pop(site, None)
+                return
+            state = self._sites.setdefault(site, {"failures": 0, "open_until": 0.0, "hold_until": 0.0, "trial": False})
+            self._sites.move_to_end(site)
+            state["failures"] += 1
+            retry_after = retry_after_seconds(getattr(error, "response", None)) or 0.0
+            if state["trial"] or state["failures"] >= self.threshold:
+                state["open_until"] = time.time() + max(self.cooldown, retry_after)
+                state["hold_until"] = 0.0
+                logger.warning(f"Circuit breaker open for {site} after {state['failures']} failure(s) in a row; last: {error}")
+            elif retry_after:
+                # The site told us when to come back; nobody in this process asks sooner
+                state["hold_until"] = time.time() + retry_after
+            state["trial"] = False
+            while len(self._sites) > _BREAKER_MAX_SITES:
+                self._sites.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Sites whose breaker is open and sites held off by a Retry-After, with seconds left."""
+        now = time.time()
+        with self._lock:
+            return {
+                "open": {site: round(s["open_until"] - now) for site, s in self._sites.items() if s["open_until"] > now},
+                "held": {site: round(s["hold_until"] - now) for site, s in self._sites.items() if s["hold_until"] > now},
+            }
+
+_host_slots = _HostSlots(FETCH_MAX_PER_HOST)
+_breaker = _CircuitBreaker(FETCH_BREAKER_THRESHOLD, FETCH_BREAKER_COOLDOWN)
+
+@contextmanager
+def polite_request(host: str):
+    """
+    Wraps one network request to host: waits for a per-host slot, fails fast while the site's
+    breaker is open, and feeds the request's outcome back to the breaker.
+    """
+    site = site_key(host)
+    with _host_slots.slot((host or "").lower(), FETCH_HOST_SLOT_WAIT):
+        _breaker.before_request(site)
+        try:
+            yield
+        except Exception as e:
+            _breaker.record(site, e)
+            raise
+        _breaker.record(site)
+
+def get_scheduler_stats() -> dict:
+    """In-flight fetches per host, open circuit breakers and Retry-After holds, e.g. for the /debug endpoint."""
+    breaker = _breaker.stats()
+    return {"in_flight": _host_slots.stats(), "open_circuits": breaker["open"], "retry_after_holds": breaker["held"]}
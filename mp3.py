@@ -0,0 +1,184 @@
+"""
+Minimal MPEG audio frame parser used to join TTS segments without ffmpeg.
+
+Each segment is reduced to its audio frames: ID3v2/ID3v1/APE tags and the
+Xing/Info/VBRI metadata frame encoders put at the start of a file are dropped,
+so the joined stream plays as one file. Durations are exact sums of the
+frames' sample counts.
+"""
+import logging
+import struct
+from typing import NamedTuple
+
+logger = logging.getLogger("mp3")
+
+# Bitrates in kbps, indexed by [version is MPEG1][layer][bitrate_index]
+_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+# Sample rates in Hz, indexed by version bits then sample rate index
+_SAMPLE_RATES = {
+    0b11: (44100, 48000, 32000),  # MPEG1
+    0b10: (22050, 24000, 16000),  # MPEG2
+    0b00: (11025, 12000, 8000),   # MPEG2.5
+}
+_LAYERS = {0b11: 1, 0b10: 2, 0b01: 3}
+
+
+class FrameHeader(NamedTuple):
+    mpeg1: bool
+    layer: int
+    has_crc: bool
+    bitrate_kbps: int
+    sample_rate: int
+    mono: bool
+    frame_length: int
+    samples: int
+
+
+class Mp3Segment(NamedTuple):
+    frames: bytes
+    frame_count: int
+    samples: int
+    sample_rate: int
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.samples / self.sample_rate if self.sample_rate else 0.0
+
+
+def parse_frame_header(data, offset: int):
+    """Returns the FrameHeader at offset, or None if there isn't a valid one."""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version_bits = (b1 >> 3) & 0b11
+    layer = _LAYERS.get((b1 >> 1) & 0b11)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0b11
+    if version_bits == 0b01 or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None  # Reserved values and free-format streams aren't something an encoder emits for us
+    mpeg1 = version_bits == 0b11
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        frame_length = (samples // 8) * bitrate // sample_rate + padding
+    return FrameHeader(
+        mpeg1=mpeg1, layer=layer, has_crc=not (b1 & 1), bitrate_kbps=bitrate // 1000,
+        sample_rate=sample_rate, mono=(b3 >> 6) == 0b11, frame_length=frame_length, samples=samples,
+    )
+
+
+def _id3v2_size(data, offset: int) -> int:
+    """Returns the total size of an ID3v2 tag at offset, or 0 if there isn't one."""
+    if data[offset:offset + 3] != b"ID3" or offset + 10 > len(data):
+        return 0
+    flags = data[offset + 5]
+    size = 0
+    for b in data[offset + 6:offset + 10]:
+        size = (size << 7) | (b & 0x7F)  # Syncsafe integer
+    return 10 + size + (10 if flags & 0x10 else 0)
+
+
+def _audio_end(data) -> int:
+    """Returns the offset where trailing ID3v1/APEv2 tags begin."""
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+        tag_size = struct.unpack("<I", data[end - 20:end - 16])[0]
+        header = 32 if data[end - 32 - tag_size:end - 24 - tag_size] == b"APETAGEX" else 0
+        end = max(0, end - tag_size - header)
+    return end
+
+
+def _is_info_frame(data, offset: int, header: FrameHeader) -> bool:
+    """True if the frame at offset carries a Xing/Info or VBRI header instead of audio."""
+    if header.layer != 3:
+        return False
+    if header.mpeg1:
+        side_info = 17 if header.mono else 32
+    else:
+        side_info = 9 if header.mono else 17
+    xing_at = offset + 4 + (2 if header.has_crc else 0) + side_info
+    if data[xing_at:xing_at + 4] in (b"Xing", b"Info"):
+        return True
+    return data[offset + 36:offset + 40] == b"VBRI"
+
+
+def strip_segment(data: bytes) -> Mp3Segment:
+    """Reduces one MP3 file to its audio frames and counts their samples."""
+    view = memoryview(data)
+    pos = _id3v2_size(data, 0)
+    end = _audio_end(data)
+    spans, frame_count, samples, sample_rate = [], 0, 0, 0
+    first = True
+    while pos + 4 <= end:
+        header = parse_frame_header(data, pos)
+        if header is None or header.frame_length < 4 or pos + header.frame_length > end:
+            # Lost sync (junk between frames or a truncated tail): scan for the next plausible frame.
+            pos = data.find(b"\xff", pos + 1, end)
+            if pos == -1:
+                break
+            continue
+        if first:
+            first = False
+            if _is_info_frame(data, pos, header):
+                pos += header.frame_length
+                continue
+        if sample_rate and header.sample_rate != sample_rate:
+            logger.warning(f"MP3: Sample rate changed mid-segment ({sample_rate} -> {header.sample_rate}); duration will be approximate.")
+        sample_rate = sample_rate or header.sample_rate
+        if spans and spans[-1][1] == pos:
+            spans[-1][1] = pos + header.frame_length
+        else:
+            spans.append([pos, pos + header.frame_length])
+        frame_count += 1
+        samples += header.samples
+        pos += header.frame_length
+    frames = b"".join(view[start:stop] for start, stop in spans)
+    return Mp3Segment(frames=frames, frame_count=frame_count, samples=samples, sample_rate=sample_rate)
+
+
+class Mp3Joiner:
+    """Joins MP3 segments in order, keeping a running frame count and exact duration."""
+    def __init__(self):
+        self.frame_count = 0
+        self.total_bytes = 0
+        self.segment_count = 0
+        self.sample_rate = 0
+        self._seconds = 0.0
+
+    def add(self, data: bytes) -> bytes:
+        """Strips one segment and returns the frames to append to the output stream."""
+        segment = strip_segment(data)
+        if segment.frame_count == 0:
+            raise ValueError(f"Segment {self.segment_count + 1} contains no MPEG audio frames.")
+        if self.sample_rate and segment.sample_rate != self.sample_rate:
+            logger.warning(f"MP3: Segment {self.segment_count + 1} sample rate {segment.sample_rate} differs from {self.sample_rate}.")
+        self.sample_rate = self.sample_rate or segment.sample_rate
+        self.frame_count += segment.frame_count
+        self.total_bytes += len(segment.frames)
+        self.segment_count += 1
+        self._seconds += segment.duration_seconds
+        return segment.frames
+
+    @property
+    def duration_seconds(self) -> float:
+        return self._seconds
@@ -0,0 +1,114 @@
+"""
+Compressed cache of fetched article pages.
+
+Entries are small JSON records keyed by a normalized URL (the URL requested and the canonical URL
+it redirected to both point at the same entry). They hold the response headers, the final URL and
+the hash of the body. Bodies are stored gzip-compressed and content-addressed by that hash. Both
+live in a TieredStore: a size-capped local disk LRU backed by an optional GCS prefix shared
+across instances. Each entry records when it was fetched. The fetcher serves young entries without touching the network, uses
+older ones for their validators, and replays any of them offline. An entry past max_age, or
+whose body is gone from both tiers, is deleted when it is next read; locally, entries are also
+evicted with the bodies by the LRU.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tiered_store import TieredStore
+
+logger = logging.getLogger("page_cache")
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ocid")
+
+def normalize_url(url: str) -> str:
+    """Drops fragments, default ports and tracking parameters so variants of a URL share an entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith(_TRACKING_PARAMS)])
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+class PageCache:
+    """
+    Fetched pages in a TieredStore: a local disk LRU with an optional GCS tier. Entries and
+    bodies share the store's size cap. Every failure is logged and treated as a miss; the cache
+    never fails a fetch.
+    """
+    def __init__(self, directory: str, max_bytes: int, bucket=None, gcs_prefix: str = "", max_age: float = 0):
+        self._store = TieredStore("PageCache", directory, max_bytes, bucket=bucket, gcs_prefix=gcs_prefix)
+        self.max_age = max_age  # Seconds an entry is kept at all; 0 keeps it until evicted
+
+    def _get_body(self, content_hash: str):
+        compressed = self._store.get(f"{content_hash}.html.gz")
+        if compressed is None:
+            return None
+        try:
+            body = gzip.decompress(compressed)
+        except (OSError, EOFError) as e:
+            logger.warning(f"PageCache: Dropping corrupt body {content_hash}: {e}")
+            return None
+        if hashlib.sha256(body).hexdigest() != content_hash:
+            logger.warning(f"PageCache: Body {content_hash} does not match its hash; ignoring it.")
+            return None
+        return body
+
+    def get(self, url: str):
+        """
+        Returns {"body", "headers", "url", "encoding", "content_hash", "fetched_at"} for url, with
+        "extraction_failed" if it was marked so, or None on a miss in both tiers.
+        """
+        entry_key = f"{_url_key(url)}.json"
+        raw = self._store.get(entry_key)
+        if raw is None:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"PageCache: Dropping unreadable entry for {url}: {e}")
+            self._store.delete(entry_key)
+            return None
+        if self.max_age and time.time() - entry.get("fetched_at", 0) > self.max_age:
+            self._store.delete(entry_key)
+            return None
+        body = self._get_body(entry["content_hash"])
+        if body is None:
+            self._store.delete(entry_key)
+            return None
+        entry["body"] = body
+        return entry
+
+    def mark_extraction_failed(self, urls: list):
+        """Sets extraction_failed on the entries for urls, in both tiers. The next put for a URL clears it."""
+        for key in {_url_key(url) for url in urls if url}:
+            raw = self._store.get(f"{key}.json")
+            if raw is None:
+                continue
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            entry["extraction_failed"] = True
+            self._store.put(f"{key}.json", json.dumps(entry).encode("utf-8"), "application/json", overwrite=True)
+
+    def put(self, urls: list, body: bytes, headers: dict, final_url: str, encoding: str | None):
+        """Stores a fetched body once and points an entry for each of urls at it."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        entry = json.dumps({
+            "url": final_url, "headers": headers, "encoding": encoding,
+            "content_hash": content_hash, "fetched_at": time.time(),
+        }).encode("utf-8")
+        body_key = f"{content_hash}.html.gz"
+        if not self._store.has_local(body_key):
+            # A body already on disk was uploaded when it was first stored
+            self._store.put(body_key, gzip.compress(body, compresslevel=6), "application/gzip")
+        for key in {_url_key(url) for url in urls if url}:
+            self._store.put(f"{key}.json", entry, "application/json", overwrite=True)
+        return content_hash
@@ -142,13 +142,7 @@ def process_article_submission(doc_ref, url, voice):
             raise TTSError(f"TTS synthesis failed: {tts_result['error']}")
 
         # 3. Finalize document
-        gcs_path = tts_result.get("gcs_path")
-        doc_ref.update({
-            "status": "done",
-            "gcs_path": gcs_path,
-            "processed_at": firestore.SERVER_TIMESTAMP,
-            "error_message": None  # Clear previous errors
-        })
+        _finalize_item(doc_ref, tts_result)
         logger.info(f"Successfully processed item {item_id}")
 
     except ExtractionError as e:
@@ -164,3 +158,103 @@ def process_article_submission(doc_ref, url, voice):
         _log_failure(item_id, user_id, url, str(e), "unknown")
         raise ProcessingError(f"An unexpected error occurred: {e}") from e
 
+
+def _finalize_item(doc_ref, tts_result: dict):
+    """Marks an item done once its audio is uploaded, mirroring the audio manifest onto the item."""
+    update_data = {
+        "status": "done",
+        "gcs_path": tts_result.get("gcs_path"),
+        "processed_at": firestore.SERVER_TIMESTAMP,
+        "error_message": None  # Clear previous errors
+    }
+    if manifest := tts_result.get("manifest"):
+        update_data.update({
+            "audio_manifest": manifest,
+            "duration_seconds": manifest.get("duration_seconds"),
+            "storage_bytes": manifest.get("size_bytes"),
+        })
+    doc_ref.update(update_data)
+
+
+def _stored_text(item_data: dict) -> str:
+    """Returns the plain text saved by a previous extraction, rebuilding it from structured_text if needed."""
+    if item_data.get("text"):
+        return item_data["text"]
+    parts = []
+    for block in item_data.get("structured_text") or []:
+        if 'text' in block:
+            parts.append(block['text'])
+        elif 'items' in block:
+            parts.extend(block['items'])
+    return "\n\n".join(parts)
+
+
+def _last_failure_stage(item_id: str, item_data: dict):
+    """
+    Returns the stage of the item's most recent failure, or None if it has none
+    or has been processed successfully since.
+    """
+    try:
+        failures = [f.to_dict() for f in db.collection("processing_failures").where("item_id", "==", item_id).stream()]
+    except Exception as e:
+        logger.warning(f"Could not look up processing failures for item {item_id}: {e}")
+        return None
+    failures = [f for f in failures if f.get("failed_at")]
+    if not failures:
+        return None
+    latest = max(failures, key=lambda f: f["failed_at"])
+    processed_at = item_data.get("processed_at")
+    if processed_at and processed_at > latest["failed_at"]:
+        return None
+    return latest.get("stage")
+
+
+def rerender_article_audio(doc_ref, voice, item_data: dict = None):
+    """
+    Re-synthesizes audio from the text already stored on the item, skipping fetch and extraction.
+    Handles failure logging and raises exceptions like process_article_submission.
+    """
+    item_id = doc_ref.id
+    if item_data is None:
+        item_data = doc_ref.get().to_dict()
+    user_id, url = item_data.get("user_id"), item_data.get("url")
+    log_extra = {"item_id": item_id, "user_id": user_id, "url": url}
+    logger.info(f"Re-rendering audio for item_id: {item_id} from stored text with voice {voice}", extra=log_extra)
+
+    try:
+        text = _stored_text(item_data)
+        if not text:
+            raise TTSError("No stored text to re-render; the article must be re-extracted.")
+        tts_result = synthesize_long_text(
+            item_data.get("title"), item_data.get("author"), text, item_id, voice,
+            force_overwrite=True, log_extra=log_extra
+        )
+        if tts_result.get("error"):
+            raise TTSError(f"TTS synthesis failed: {tts_result['error']}")
+        _finalize_item(doc_ref, tts_result)
+        logger.info(f"Successfully re-rendered audio for item {item_id}")
+    except TTSError as e:
+        logger.error(f"TTS re-render failed for {item_id}: {e}", exc_info=True)
+        _log_failure(item_id, user_id, url, str(e), "tts")
+        raise ProcessingError(f"TTS failed: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred re-rendering {item_id}: {e}", exc_info=True)
+        _log_failure(item_id, user_id, url, str(e), "unknown")
+        raise ProcessingError(f"An unexpected error occurred: {e}") from e
+
+
+def reprocess_article(doc_ref, url, voice, full: bool = False, item_data: dict = None):
+    """
+    Retries an item with the cheapest path that can fix it: a TTS-only re-render when its
+    last failure was at the "tts" stage and extracted text is stored, otherwise a full reprocess.
+    full forces a fresh fetch and extraction, for when the stored text itself is wrong.
+    """
+    if full:
+        process_article_submission(doc_ref, url, voice)
+        return
+    if item_data is None:
+        item_data = doc_ref.get().to_dict()
+    if _last_failure_stage(doc_ref.id, item_data) == "tts" and _stored_text(item_data):
+        rerender_article_audio(doc_ref, voice, item_data=item_data)
+    else:
+        process_article_submission(doc_ref, url, voice)
@@ -135,11 +135,15 @@ def generate_feed(db_client, storage_client, app_config: dict) -> str:
         if item_data.get("author"): fe.author(name=item_data.get("author"))
 
         if gcs_path:
-            blob = bucket.get_blob(gcs_path)
+            # Items with an audio manifest already know their size, so signing needs no GCS round trip.
+            length_bytes = (item_data.get("audio_manifest") or {}).get("size_bytes") or item_data.get("storage_bytes")
+            blob = bucket.blob(gcs_path) if length_bytes else bucket.get_blob(gcs_path)
             if blob:
+                if not length_bytes:
+                    length_bytes = blob.size
                 # Generate a signed URL, valid for a long time for RSS readers
                 audio_url = _generate_signed_url(blob, expiration_minutes=60*24*7) # 7 days
-                length_bytes = str(blob.size) if blob.size is not None else "0"
+                length_bytes = str(length_bytes) if length_bytes is not None else "0"
                 
                 if audio_url:
                     fe.enclosure(url=audio_url, length=length_bytes, type="audio/mpeg")
@@ -0,0 +1,170 @@
+"""
+Compiled matcher for the admin extraction rules.
+
+Domain rules live in a hash map and are matched on the host and each parent domain in turn, so a
+rule for example.com also covers www.example.com and news.example.com (the most specific rule
+wins). URL-prefix rules live in a character trie, so the longest matching prefix wins. Both
+ignore the scheme, the host's case and a leading "www."; paths match case-sensitively. A lookup costs O(length of the URL) however many rules
+there are.
+
+Rules that name a preferred extractor pin it. Rules with a content selector (see selector_rules)
+go into a second matcher, together with the built-in defaults, which stored rules override.
+
+Both matchers are rebuilt from the extraction_rules collection by a Firestore snapshot listener,
+and on demand after an admin edits rules in this process. If the listener can't be started,
+it falls back to a periodic reload.
+"""
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from gcp import db
+from selector_rules import compile_rules, default_rules
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_RULES_LISTENER = os.getenv("EXTRACTION_RULES_LISTENER", "true").lower() == "true"
+_RULES_CACHE_TTL = 300 # 5 minutes, when polling
+_LISTENER_SAFETY_TTL = 3600 # Reload now and then even with a listener, in case its stream silently died
+
+_RULE = None  # Trie key holding the rule that ends at a node; never a character
+
+def _strip_scheme_and_www(value: str) -> str:
+    """Drops the scheme and a leading "www.", and lowercases the host; the path keeps its case."""
+    value = value.strip()
+    if "://" in value:
+        value = value.split("://", 1)[1]
+    host, slash, path = value.partition("/")
+    host = host.lower()
+    return (host[4:] if host.startswith("www.") else host) + slash + path
+
+def _domain_key(pattern: str) -> str:
+    """Accepts "example.com", "www.example.com" or a pasted URL, and returns "example.com"."""
+    host = _strip_scheme_and_www(pattern).split("/", 1)[0]
+    return host.split(":", 1)[0]
+
+def pattern_key(pattern: str, pattern_type: str) -> str:
+    """The key a rule is matched on; empty for a pattern with no host left (e.g. "www."), which is rejected."""
+    if pattern_type == "domain":
+        return _domain_key(pattern or "")
+    key = _strip_scheme_and_www(pattern or "")
+    return key if key.split("/", 1)[0] else ""
+
+class RuleMatcher:
+    def __init__(self, rules: list):
+        self.rules = list(rules)
+        self._domains = {}
+        self._prefixes = {}
+        for rule in self.rules:
+            key = pattern_key(rule.get("pattern"), rule.get("pattern_type"))
+            if not key:
+                if rule.get("pattern"):
+                    logger.warning(f"Skipping extraction rule {rule.get('id')}: pattern '{rule['pattern']}' names no host.")
+                continue
+            if rule.get("pattern_type") == "domain":
+                self._domains.setdefault(key, rule)
+            elif rule.get("pattern_type") == "url_prefix":
+                node = self._prefixes
+                for ch in key:
+                    node = node.setdefault(ch, {})
+                node.setdefault(_RULE, rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _match_prefix(self, url: str):
+        node, best = self._prefixes, self._prefixes.get(_RULE)
+        for ch in _strip_scheme_and_www(url):
+            node = node.get(ch)
+            if node is None:
+                break
+            best = node.get(_RULE, best)
+        return best
+
+    def _match_domain(self, host: str):
+        host = host.lower()
+        while host:
+            rule = self._domains.get(host)
+            if rule is not None:
+                return rule
+            host = host.partition(".")[2]
+        return None
+
+    def match(self, url: str):
+        """Returns the rule for url: a matching URL prefix, being more specific, beats a domain rule."""
+        return self._match_prefix(url) or self._match_domain(urlsplit(url).hostname or "")
+
+_matcher = None
+_matcher_built_at = 0.0
+_selector_matcher = RuleMatcher(compile_rules(default_rules()))
+_listener = None
+_listener_failed = False
+_lock = threading.Lock()
+
+def _rules_from_docs(docs) -> list:
+    rules = []
+    for doc in docs:
+        rule = doc.to_dict()
+        rule["id"] = doc.id
+        rules.append(rule)
+    return rules
+
+def _install(rules: list, source: str):
+    global _matcher, _matcher_built_at, _selector_matcher
+    selector_rules = compile_rules(rules)
+    # Stored rules come first, so they win over a default for the same pattern
+    _selector_matcher = RuleMatcher(selector_rules + compile_rules(default_rules()))
+    _matcher = RuleMatcher([rule for rule in rules if rule.get("preferred_extractor")])
+    _matcher_built_at = time.time()
+    logger.info(f"Compiled {len(rules)} extraction rule(s) from {source}, {len(selector_rules)} with selectors.")
+
+def _on_rules_snapshot(col_snapshot, changes, read_time):
+    try:
+        with _lock:
+            _install(_rules_from_docs(col_snapshot), "a Firestore snapshot")
+    except Exception as e:
+        logger.error(f"Could not rebuild extraction rules from snapshot: {e}", exc_info=True)
+
+def _start_listener():
+    global _listener, _listener_failed
+    try:
+        _listener = db.collection("extraction_rules").on_snapshot(_on_rules_snapshot)
+        logger.info("Listening for extraction rule changes.")
+    except Exception as e:
+        _listener_failed = True
+        logger.warning(f"Could not start the extraction rules listener, polling every {_RULES_CACHE_TTL}s instead: {e}")
+
+def get_rule_matcher() -> RuleMatcher:
+    """Returns the current matcher, loading the rules if it is missing or stale."""
+    if EXTRACTION_RULES_LISTENER and _listener is None and not _listener_failed:
+        with _lock:
+            if _listener is None and not _listener_failed:
+                _start_listener()
+    ttl = _LISTENER_SAFETY_TTL if _listener is not None else _RULES_CACHE_TTL
+    if _matcher is not None and time.time() - _matcher_built_at < ttl:
+        return _matcher
+    with _lock:
+        if _matcher is not None and time.time() - _matcher_built_at < ttl:
+            return _matcher
+        try:
+            _install(_rules_from_docs(db.collection("extraction_rules").stream()), "Firestore")
+        except Exception as e:
+            logger.error(f"Could not fetch extraction rules from Firestore: {e}", exc_info=True)
+            return _matcher or RuleMatcher([])
+        return _matcher
+
+def invalidate_rules():
+    """Forces a reload on the next lookup; call after writing to extraction_rules."""
+    global _matcher_built_at
+    _matcher_built_at = 0.0
+
+def find_matching_rule(url: str):
+    """Returns the rule pinning a preferred extractor for url, or None."""
+    return get_rule_matcher().match(url)
+
+def find_selector_rule(url: str):
+    """Returns the selector rule for url, stored or built in, with its SelectorRule under "compiled"; or None."""
+    get_rule_matcher()  # Reloads both matchers when they are stale
+    return _selector_matcher.match(url)
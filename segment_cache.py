@@ -0,0 +1,122 @@
+"""
+Content-addressed cache for synthesized TTS segments.
+
+Each SSML chunk is keyed by a hash of everything that changes the audio it produces
+(SSML text, voice, speaking rate, audio encoding). Segments live in a size-capped
+local disk LRU, backed by an optional GCS prefix shared across instances.
+Per-item checkpoints record which chunks of an in-progress synthesis are done.
+"""
+import hashlib
+import json
+import logging
+
+from tiered_store import TieredStore
+
+logger = logging.getLogger("segment_cache")
+
+def segment_key(ssml_text: str, voice_name: str, speaking_rate: float, audio_encoding: str) -> str:
+    """Returns the content address for a synthesized segment."""
+    h = hashlib.sha256()
+    for part in (ssml_text, voice_name, f"{float(speaking_rate):.3f}", str(audio_encoding)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def content_fingerprint(chunk_keys: list) -> str:
+    """Identifies the full audio for an item: changes if any chunk's text, voice, rate or encoding does."""
+    return hashlib.sha256("\n".join(chunk_keys).encode("utf-8")).hexdigest()
+
+class SegmentCache:
+    """
+    Segment bytes in a TieredStore: a local disk LRU with an optional GCS tier.
+    Every failure is logged and treated as a miss; the cache never fails a synthesis.
+    """
+    def __init__(self, directory: str, max_bytes: int, bucket=None, gcs_prefix: str = ""):
+        self._store = TieredStore("SegmentCache", directory, max_bytes, bucket=bucket, gcs_prefix=gcs_prefix)
+
+    @property
+    def bucket(self):
+        """The GCS bucket backing the cache, or None without a GCS tier."""
+        return self._store.bucket
+
+    def get(self, key: str):
+        """Returns cached segment bytes, or None on a miss in both tiers."""
+        return self._store.get(f"{key}.mp3")
+
+    def put(self, key: str, data: bytes):
+        """Stores a segment in the local tier and, if configured, the GCS tier."""
+        self._store.put(f"{key}.mp3", data, "audio/mpeg")
+
+class ItemCheckpoint:
+    """
+    Per-item record of synthesized segments in GCS, so a retried synthesis only renders missing chunks.
+    Redundant with the SegmentCache GCS tier, which keeps finished chunks across retries itself.
+
+    The manifest stores a fingerprint of the item's segment keys, which cover the SSML text, voice,
+    speaking rate and encoding. If any of those change, the checkpoint is discarded and restarted.
+    Segment objects only become visible once fully written, so their presence marks completion.
+    """
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, bucket, prefix: str, item_id: str, chunk_keys: list):
+        self.bucket = bucket
+        self.base = f"{prefix}{item_id}/"
+        self.chunk_keys = list(chunk_keys)
+        self.fingerprint = content_fingerprint(self.chunk_keys)
+        self.completed = set()
+
+    def _segment_name(self, idx: int) -> str:
+        return f"{self.base}seg_{idx:04d}.mp3"
+
+    def open(self, log_extra: dict = None):
+        """Loads a matching checkpoint, or discards a stale one and writes a fresh manifest."""
+        manifest_blob = self.bucket.blob(self.base + self.MANIFEST_NAME)
+        try:
+            manifest = json.loads(manifest_blob.download_as_text())
+        except Exception:
+            manifest = None
+        try:
+            if manifest and manifest.get("fingerprint") == self.fingerprint:
+                for blob in self.bucket.list_blobs(prefix=f"{self.base}seg_"):
+                    idx = int(blob.name[len(self.base) + 4:-4])
+                    if idx < len(self.chunk_keys):
+                        self.completed.add(idx)
+                logger.info(f"Checkpoint: Resuming {self.base} with {len(self.completed)}/{len(self.chunk_keys)} segment(s) done.", extra=log_extra)
+                return
+            if manifest:
+                logger.info(f"Checkpoint: Text or voice changed for {self.base}; discarding {len(manifest.get('chunk_keys', []))}-chunk checkpoint.", extra=log_extra)
+                self.clear(log_extra)
+            manifest_blob.upload_from_string(
+                json.dumps({"fingerprint": self.fingerprint, "chunk_keys": self.chunk_keys}),
+                content_type="application/json",
+            )
+        except Exception as e:
+            logger.warning(f"Checkpoint: Could not open {self.base}: {e}", extra=log_extra)
+
+    def get(self, idx: int):
+        """Returns the checkpointed segment for chunk idx, or None."""
+        if idx not in self.completed:
+            return None
+        try:
+            return self.bucket.blob(self._segment_name(idx)).download_as_bytes()
+        except Exception as e:
+            logger.warning(f"Checkpoint: Could not read segment {idx} of {self.base}: {e}")
+            self.completed.discard(idx)
+            return None
+
+    def put(self, idx: int, data: bytes):
+        try:
+            self.bucket.blob(self._segment_name(idx)).upload_from_string(data, content_type="audio/mpeg")
+            self.completed.add(idx)
+        except Exception as e:
+            logger.warning(f"Checkpoint: Could not save segment {idx} of {self.base}: {e}")
+
+    def clear(self, log_extra: dict = None):
+        """Deletes the checkpoint once the merged audio is safely uploaded (or the checkpoint is stale)."""
+        try:
+            blobs = list(self.bucket.list_blobs(prefix=self.base))
+            if blobs:
+                self.bucket.delete_blobs(blobs, on_error=lambda blob: None)
+            self.completed.clear()
+        except Exception as e:
+            logger.warning(f"Checkpoint: Could not clear {self.base}: {e}", extra=log_extra)
@@ -0,0 +1,120 @@
+"""
+Declarative, CSS-selector extraction rules for individual sites.
+
+A rule names the element holding the article (content_selector), elements inside it to throw
+away (drop_selectors, e.g. inline promos), and optionally where the title and author are.
+Selectors are compiled to XPath once, when the rules are loaded, so extracting a page is a
+single lookup on the already-parsed tree.
+
+Rules live in the extraction_rules collection alongside the preferred-extractor rules (a rule
+may carry both) and are matched and hot-reloaded by rule_matcher. DEFAULT_SELECTOR_RULES covers
+sites we know well; a stored rule for the same pattern replaces the default.
+"""
+import copy
+import logging
+
+from cssselect import SelectorError
+from lxml.cssselect import CSSSelector
+
+from extraction_pool import parse_structured_content, text_from_blocks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SELECTOR_RULES = {
+    "nytimes.com": {"content_selector": "section[name='articleBody']"},
+    "defector.com": {"content_selector": "div[data-testid='article-content']"},
+    "newyorker.com": {"content_selector": "section[class*='body__inner-container']"},
+    "washingtonpost.com": {"content_selector": "article"},
+    "bbc.com": {"content_selector": "article"},
+    "scientificamerican.com": {"content_selector": "article"},
+    "theatlantic.com": {"content_selector": "div.article-body"},
+}
+
+def default_rules() -> list:
+    """The built-in rules in the same shape as stored ones."""
+    return [
+        {"id": None, "pattern": domain, "pattern_type": "domain", **fields}
+        for domain, fields in DEFAULT_SELECTOR_RULES.items()
+    ]
+
+def parse_selector_list(value) -> list:
+    """Accepts a list or a comma/newline separated string, as typed into the admin form."""
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = (value or "").replace("\n", ",").split(",")
+    return [item.strip() for item in items if item and item.strip()]
+
+def _compile(selector: str) -> CSSSelector | None:
+    return CSSSelector(selector) if selector else None
+
+def _element_text(tree, selector) -> str:
+    if selector is None:
+        return ""
+    for el in selector(tree):
+        text = " ".join(el.text_content().split())
+        if text:
+            return text
+    return ""
+
+class SelectorRule:
+    """A rule with its selectors compiled. Raises SelectorError for a malformed selector."""
+    def __init__(self, rule: dict):
+        self.content = CSSSelector(rule["content_selector"])
+        self.drop = [CSSSelector(s) for s in parse_selector_list(rule.get("drop_selectors"))]
+        self.title = _compile(rule.get("title_selector"))
+        self.author = _compile(rule.get("author_selector"))
+
+    def extract(self, tree) -> dict | None:
+        """Returns {"text", "structured_text", "title", "author"}, or None if the content selector finds nothing."""
+        content = next(iter(self.content(tree)), None)
+        if content is None:
+            return None
+        if self.drop:
+            # Work on a copy so the other extractors still see the page as it was
+            content = copy.deepcopy(content)
+            for selector in self.drop:
+                for el in selector(content):
+                    if el is not content:
+                        el.drop_tree()
+        structured_text = parse_structured_content(content)
+        text = text_from_blocks(structured_text)
+        if not text:
+            text = " ".join(content.text_content().split())
+            structured_text = [{"type": "p", "text": text}] if text else []
+        return {
+            "text": text,
+            "structured_text": structured_text,
+            "title": _element_text(tree, self.title),
+            "author": _element_text(tree, self.author),
+        }
+
+def compile_rules(rules: list) -> list:
+    """
+    Returns a copy of each rule that has a content selector, with its SelectorRule under "compiled".
+    Malformed rules are logged and skipped.
+    """
+    compiled = []
+    for rule in rules:
+        if not rule.get("content_selector"):
+            continue
+        try:
+            compiled.append({**rule, "compiled": SelectorRule(rule)})
+        except SelectorError as e:
+            logger.error(f"Skipping selector rule {rule.get('id') or rule.get('pattern')}: invalid selector ({e}).")
+    return compiled
+
+def validate_rule(rule: dict) -> str | None:
+    """Returns an error message for the admin form, or None if every selector compiles."""
+    for field in ("content_selector", "title_selector", "author_selector"):
+        if rule.get(field):
+            try:
+                CSSSelector(rule[field])
+            except SelectorError as e:
+                return f"Invalid {field.replace('_', ' ')} '{rule[field]}': {e}"
+    for selector in parse_selector_list(rule.get("drop_selectors")):
+        try:
+            CSSSelector(selector)
+        except SelectorError as e:
+            return f"Invalid drop selector '{selector}': {e}"
+    return None
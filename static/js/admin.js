@@ -114,7 +114,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (button.matches('.reprocess-btn')) {
       actionName = 'reprocess';
-      endpoint = `/admin/reprocess/${id}`;
+      endpoint = `/admin/reprocess/${id}?mode=full`;
     } else if (button.matches('.delete-btn')) {
       actionName = 'delete';
       endpoint = `/admin/delete/${id}`;
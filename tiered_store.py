@@ -0,0 +1,154 @@
+"""
+Two-tier blob store shared by the segment and page caches.
+
+Blobs live in a size-capped local disk LRU, backed by an optional GCS prefix shared across
+instances. A key is stored as {directory}/{key[:2]}/{key} locally and {gcs_prefix}{key} in GCS,
+so it should carry its own extension. Local writes are atomic, and reads refresh the file's
+mtime so a restarted process rebuilds the same LRU order from disk.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("tiered_store")
+
+class TieredStore:
+    """
+    Local disk LRU of blobs with an optional GCS tier. name prefixes log messages.
+    Every failure is logged and treated as a miss; the store never fails its caller.
+    """
+    def __init__(self, name: str, directory: str, max_bytes: int, bucket=None, gcs_prefix: str = ""):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes if directory else 0
+        self.bucket = bucket if gcs_prefix else None
+        self.gcs_prefix = gcs_prefix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        if self.max_bytes > 0:
+            self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load_index(self):
+        """Rebuilds the LRU order from files left by a previous process, oldest access first."""
+        found = []
+        try:
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    st = os.stat(os.path.join(root, name))
+                    found.append((st.st_mtime, name, st.st_size))
+        except OSError as e:
+            logger.warning(f"{self.name}: Could not scan {self.directory}: {e}")
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+        logger.info(f"{self.name}: Loaded {len(self._entries)} file(s), {self._total_bytes} bytes from {self.directory}.")
+
+    def _evict(self):
+        """Drops least recently used blobs until the local tier fits max_bytes. Caller holds the lock or is __init__."""
+        while self._entries and self._total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _get_local(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Keep on-disk order in step with the in-memory LRU across restarts
+            return data
+        except OSError as e:
+            logger.warning(f"{self.name}: Dropping unreadable {key}: {e}")
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+            return None
+
+    def _put_local(self, key: str, data: bytes):
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"{self.name}: Could not write {key}: {e}")
+            return
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def has_local(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str):
+        """Returns the blob's bytes, or None on a miss in both tiers. A GCS hit is copied to the local tier."""
+        data = self._get_local(key)
+        if data is not None:
+            return data
+        if self.bucket is None:
+            return None
+        try:
+            data = self.bucket.blob(f"{self.gcs_prefix}{key}").download_as_bytes()
+        except Exception as e:
+            # NotFound is the common case; anything else is still just a miss.
+            logger.debug(f"{self.name}: GCS miss for {key}: {e}")
+            return None
+        self._put_local(key, data)
+        return data
+
+    def put(self, key: str, data: bytes, content_type: str, overwrite: bool = False):
+        """
+        Stores a blob in the local tier and, if configured, the GCS tier. Without overwrite the key
+        is taken to be content-addressed, so an existing GCS object is already correct and is kept.
+        """
+        if not data:
+            return
+        self._put_local(key, data)
+        if self.bucket is None:
+            return
+        try:
+            blob = self.bucket.blob(f"{self.gcs_prefix}{key}")
+            if overwrite:
+                blob.upload_from_string(data, content_type=content_type)
+            else:
+                blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+        except Exception as e:
+            logger.debug(f"{self.name}: GCS upload skipped for {key}: {e}")
+
+    def delete(self, key: str):
+        """Removes a blob from both tiers."""
+        with self._lock:
+            known = key in self._entries
+            self._total_bytes -= self._entries.pop(key, 0)
+        if known:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        if self.bucket is None:
+            return
+        try:
+            self.bucket.blob(f"{self.gcs_prefix}{key}").delete()
+        except Exception as e:
+            logger.debug(f"{self.name}: GCS delete skipped for {key}: {e}")
@@ -1,11 +1,20 @@
 import logging
 import os
-import tempfile
-import subprocess
 import html  # For SSML escaping
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from contextlib import closing
 from typing import List, Dict
+from google.api_core import exceptions as gexc
 from google.cloud import texttospeech, storage
 from exceptions import TTSError
+from segment_cache import ItemCheckpoint, SegmentCache, content_fingerprint, segment_key
+from mp3 import Mp3Joiner
 
 logger = logging.getLogger("tts")
 logger.setLevel(logging.INFO)
@@ -13,73 +22,503 @@ logger.setLevel(logging.INFO)
 # ─── Configuration ──────────────────────────────────────────────
 GCS_BUCKET = os.getenv("GCS_BUCKET_NAME", "speakloudtts-audio-files")
 MAX_BYTES = 4500  # Google TTS SSML limit is 5000; leave buffer
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))  # Concurrent synthesize_speech calls per item
+# The local tier is off unless given a directory; on Cloud Run the temp dir is memory, not disk
+SEGMENT_CACHE_DIR = os.getenv("TTS_SEGMENT_CACHE_DIR", "")
+SEGMENT_CACHE_MAX_BYTES = int(os.getenv("TTS_SEGMENT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))  # 0 disables the local tier
+# Opt-in: segments written here stay in the audio bucket until a lifecycle rule removes them
+SEGMENT_CACHE_GCS_PREFIX = os.getenv("TTS_SEGMENT_CACHE_GCS_PREFIX", "")  # e.g. segment-cache/; empty disables the GCS tier
+TTS_CHECKPOINT_PREFIX = os.getenv("TTS_CHECKPOINT_PREFIX", "checkpoints/")  # Empty disables per-item resume
+TTS_UPLOAD_MODE = os.getenv("TTS_UPLOAD_MODE", "stream").lower()  # "stream" (resumable, no temp files) or "buffered"
+AUDIO_MANIFEST_METADATA_KEY = "audio_manifest"
+_UPLOAD_CHUNK_GRANULARITY = 256 * 1024  # GCS resumable chunks must be a multiple of 256 KiB
+# Process-wide TTS quota shaping; set these a little under your project's quotas
+TTS_REQUESTS_PER_MINUTE = int(os.getenv("TTS_REQUESTS_PER_MINUTE", "900"))
+TTS_CHARACTERS_PER_MINUTE = int(os.getenv("TTS_CHARACTERS_PER_MINUTE", "450000"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "16"))  # Ceiling for the adaptive in-flight limit across all items
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "4"))
+TTS_RETRY_BASE_SECONDS = 1.0
+TTS_RETRY_MAX_SECONDS = 30.0
+# Hedged requests: duplicate a chunk that is slower than the voice's live latency percentile
+TTS_HEDGE_ENABLED = os.getenv("TTS_HEDGE_ENABLED", "false").lower() == "true"
+TTS_HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0.95"))
+TTS_HEDGE_MAX_RATIO = float(os.getenv("TTS_HEDGE_MAX_RATIO", "0.1"))  # Extra requests allowed per primary request
+TTS_HEDGE_MIN_SAMPLES = 20  # Latency samples per voice before hedging kicks in
+TTS_LATENCY_WINDOW = 200  # Recent latencies kept per voice
+UPLOAD_CHUNK_BYTES = max(1, int(os.getenv("TTS_UPLOAD_CHUNK_BYTES", str(1024 * 1024))) // _UPLOAD_CHUNK_GRANULARITY) * _UPLOAD_CHUNK_GRANULARITY
+
+# ─── Rate Limiting ──────────────────────────────────────────────
+class _TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute's worth of tokens. Callers hold the limiter lock."""
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(max(1, rate_per_minute))
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # An oversize request waits for a full bucket instead of forever
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _RateLimiter:
+    """Blocks until both the requests-per-minute and characters-per-minute buckets can cover a call."""
+    def __init__(self, requests_per_minute: int, characters_per_minute: int):
+        self._lock = threading.Lock()
+        self._requests = _TokenBucket(requests_per_minute)
+        self._characters = _TokenBucket(characters_per_minute)
+
+    def acquire(self, characters: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(self._requests.wait_time(1, now), self._characters.wait_time(characters, now))
+                if delay == 0:
+                    self._requests.take(1)
+                    self._characters.take(characters)
+                    return
+            time.sleep(delay)
+
+
+class _AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight TTS calls across the process: +1 per limit's worth of successes,
+    halved on quota or deadline errors (at most once per backoff window so a burst of
+    failures from the same overload only counts once).
+    """
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_cooldown: float = 5.0):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._decrease_cooldown = decrease_cooldown
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self._decrease_cooldown:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+                    logger.warning(f"TTS: Throttled; concurrency limit reduced to {int(self.limit)}.")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+_RATE_LIMITER = _RateLimiter(TTS_REQUESTS_PER_MINUTE, TTS_CHARACTERS_PER_MINUTE)
+_CONCURRENCY = _AdaptiveConcurrency(TTS_MAX_CONCURRENCY)
+_THROTTLE_ERRORS = (gexc.ResourceExhausted, gexc.DeadlineExceeded)
+_RETRYABLE_ERRORS = _THROTTLE_ERRORS + (gexc.ServiceUnavailable, gexc.InternalServerError, gexc.Aborted)
+
+class _LatencyTracker:
+    """Rolling window of successful synthesize_speech latencies per voice."""
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._window = window
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int):
+        """Returns the pct latency for key, or None until min_samples have been recorded."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(pct * len(samples)))]
+
+
+class _HedgeStats:
+    """Counters for hedged requests; a hedge is only fired while fired <= max_ratio * requests."""
+    def __init__(self, max_ratio: float):
+        self._lock = threading.Lock()
+        self.max_ratio = max_ratio
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.denied = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_fire(self) -> bool:
+        with self._lock:
+            if self.fired + 1 > self.max_ratio * self.requests:
+                self.denied += 1
+                return False
+            self.fired += 1
+            return True
+
+    def count_win(self):
+        with self._lock:
+            self.won += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "hedges_fired": self.fired, "hedges_won": self.won, "hedges_denied": self.denied}
+
+
+_LATENCY = _LatencyTracker(TTS_LATENCY_WINDOW)
+_HEDGE_STATS = _HedgeStats(TTS_HEDGE_MAX_RATIO)
+_HEDGE_EXECUTOR = None
+_HEDGE_EXECUTOR_LOCK = threading.Lock()
+
+def get_hedge_stats() -> dict:
+    """Returns process-wide hedging counters, e.g. for the /debug endpoint."""
+    return {"enabled": TTS_HEDGE_ENABLED, **_HEDGE_STATS.snapshot()}
+
+def _get_hedge_executor():
+    global _HEDGE_EXECUTOR
+    if _HEDGE_EXECUTOR is None:
+        with _HEDGE_EXECUTOR_LOCK:
+            if _HEDGE_EXECUTOR is None:
+                _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY * 2, thread_name_prefix="tts-hedge")
+    return _HEDGE_EXECUTOR
+
+def _call_synthesize(tts_client, request: dict, characters: int, latency_key: str = "", sent: threading.Event = None):
+    """
+    The single gateway to synthesize_speech: every call passes the shared rate limiter and
+    concurrency controller, and transient failures are retried with full-jitter backoff.
+    sent, if given, is set once the request holds its token and slot and goes out.
+    """
+    for attempt in range(TTS_MAX_RETRIES + 1):
+        _RATE_LIMITER.acquire(characters)
+        _CONCURRENCY.acquire()
+        throttled = False
+        try:
+            if sent is not None:
+                sent.set()
+            started = time.monotonic()
+            response = tts_client.synthesize_speech(request=request)
+            _LATENCY.record(latency_key, time.monotonic() - started)
+            return response
+        except _RETRYABLE_ERRORS as e:
+            throttled = isinstance(e, _THROTTLE_ERRORS)
+            if attempt == TTS_MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(TTS_RETRY_MAX_SECONDS, TTS_RETRY_BASE_SECONDS * 2 ** attempt))
+            logger.warning(f"TTS: {type(e).__name__} on attempt {attempt+1}/{TTS_MAX_RETRIES+1}; retrying in {delay:.1f}s.")
+        finally:
+            _CONCURRENCY.release(throttled=throttled)
+        time.sleep(delay)
+
+def _call_synthesize_hedged(tts_client, request: dict, characters: int, latency_key: str):
+    """
+    Like _call_synthesize, but if the call, once it has gone out, outlives the voice's
+    TTS_HEDGE_PERCENTILE latency a duplicate is sent and the first successful response wins. The
+    loser is left to finish in the background. Hedges are capped at TTS_HEDGE_MAX_RATIO of primary requests.
+    """
+    _HEDGE_STATS.count_request()
+    if not TTS_HEDGE_ENABLED:
+        return _call_synthesize(tts_client, request, characters, latency_key)
+    hedge_after = _LATENCY.percentile(latency_key, TTS_HEDGE_PERCENTILE, TTS_HEDGE_MIN_SAMPLES)
+    if hedge_after is None:
+        return _call_synthesize(tts_client, request, characters, latency_key)
+
+    executor = _get_hedge_executor()
+    sent = threading.Event()
+    primary = executor.submit(_call_synthesize, tts_client, request, characters, latency_key, sent)
+    primary.add_done_callback(lambda _: sent.set())
+    # Time spent queued for a rate-limit token or a concurrency slot isn't the API being slow
+    sent.wait()
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not _HEDGE_STATS.try_fire():
+        return primary.result()
+
+    logger.info(f"TTS: Chunk exceeded p{int(TTS_HEDGE_PERCENTILE * 100)} latency ({hedge_after:.2f}s) for {latency_key}; sending hedge.")
+    hedge = executor.submit(_call_synthesize, tts_client, request, characters, latency_key)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _HEDGE_STATS.count_win()
+                return future.result()
+    return primary.result()  # Both failed; surface the primary's error
+
+# ─── SSML ───────────────────────────────────────────────────────
+SPEAK_OPEN, SPEAK_CLOSE = "<speak>", "</speak>"
+P_OPEN, P_CLOSE = "<p>", "</p>"
+PARAGRAPH_BREAK = "<break time='500ms'/>"
+_SENTENCE_BOUNDARY_RE = re.compile(r"[.!?\u2026]+[\"'\u201d\u2019)\]]*\s+")
+_CLAUSE_BOUNDARY_RE = re.compile(r"(?:[,;:]|\s[\u2013\u2014-])\s+")
+_WORD_BOUNDARY_RE = re.compile(r"\s+")
 
 # ─── GCP Clients ────────────────────────────────────────────────
 TTS_CLIENT_INSTANCE = None
 STORAGE_CLIENT_INSTANCE = None
 GCS_BUCKET_INSTANCE = None
+SEGMENT_CACHE_INSTANCE = None
+_TTS_CLIENT_LOCK = threading.Lock()  # Guards lazy client creation when chunks synthesize concurrently
 
-def _get_tts_client():
+def _get_tts_client(log_extra: dict = None):
     global TTS_CLIENT_INSTANCE
     if TTS_CLIENT_INSTANCE is None:
-        try:
-            TTS_CLIENT_INSTANCE = texttospeech.TextToSpeechClient()
-            logger.info("TTS: Initialized TextToSpeechClient.")
-        except Exception as e:
-            logger.critical(f"TTS: Failed to initialize TextToSpeechClient: {e}", exc_info=True, extra=log_extra)
-            raise TTSError(f"TTS client initialization failed: {e}") from e
+        with _TTS_CLIENT_LOCK:
+            if TTS_CLIENT_INSTANCE is None:
+                try:
+                    TTS_CLIENT_INSTANCE = texttospeech.TextToSpeechClient()
+                    logger.info("TTS: Initialized TextToSpeechClient.", extra=log_extra)
+                except Exception as e:
+                    logger.critical(f"TTS: Failed to initialize TextToSpeechClient: {e}", exc_info=True, extra=log_extra)
+                    raise TTSError(f"TTS client initialization failed: {e}") from e
     return TTS_CLIENT_INSTANCE
 
-def _get_storage_client_and_bucket():
+def _get_storage_client_and_bucket(log_extra: dict = None):
     global STORAGE_CLIENT_INSTANCE, GCS_BUCKET_INSTANCE
     if STORAGE_CLIENT_INSTANCE is None or GCS_BUCKET_INSTANCE is None:
         try:
             STORAGE_CLIENT_INSTANCE = storage.Client()
             GCS_BUCKET_INSTANCE = STORAGE_CLIENT_INSTANCE.bucket(GCS_BUCKET)
-            logger.info("TTS: Initialized StorageClient and bucket '{GCS_BUCKET}'.", extra=log_extra)
+            logger.info(f"TTS: Initialized StorageClient and bucket '{GCS_BUCKET}'.", extra=log_extra)
         except Exception as e:
             logger.critical(f"TTS: Failed to initialize StorageClient or bucket '{GCS_BUCKET}': {e}", exc_info=True, extra=log_extra)
             raise TTSError(f"Storage client or bucket initialization failed: {e}") from e
     return STORAGE_CLIENT_INSTANCE, GCS_BUCKET_INSTANCE
 
-def _build_ssml(title: str, author: str, paragraphs: List[str]) -> List[str]:
-    """Splits article into SSML chunks < MAX_BYTES bytes for Google TTS."""
+def _get_segment_cache(bucket):
+    global SEGMENT_CACHE_INSTANCE
+    if SEGMENT_CACHE_INSTANCE is None:
+        # An empty directory leaves the local tier off
+        SEGMENT_CACHE_INSTANCE = SegmentCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES, bucket=bucket, gcs_prefix=SEGMENT_CACHE_GCS_PREFIX)
+        if SEGMENT_CACHE_GCS_PREFIX and TTS_CHECKPOINT_PREFIX:
+            logger.warning("TTS: Both TTS_SEGMENT_CACHE_GCS_PREFIX and TTS_CHECKPOINT_PREFIX are set, so every chunk is uploaded twice; "
+                           "the segment cache already lets retries skip finished chunks, so consider setting TTS_CHECKPOINT_PREFIX empty.")
+    return SEGMENT_CACHE_INSTANCE
+
+def _ssml_bytes(escaped_text: str) -> int:
+    return len(escaped_text.encode('utf-8'))
+
+def _split_at(text: str, boundary: re.Pattern) -> List[str]:
+    """Splits text after each boundary match, keeping punctuation with the preceding piece."""
+    parts, start = [], 0
+    for m in boundary.finditer(text):
+        parts.append(text[start:m.end()].strip())
+        start = m.end()
+    parts.append(text[start:].strip())
+    return [p for p in parts if p]
+
+def _split_to_fit(text: str, max_bytes: int, boundaries=(_CLAUSE_BOUNDARY_RE, _WORD_BOUNDARY_RE)) -> List[str]:
+    """
+    Splits text at the coarsest boundary that makes every piece's escaped size fit max_bytes,
+    falling back to a hard character split for text with no usable boundary.
+    """
+    if _ssml_bytes(html.escape(text)) <= max_bytes:
+        return [text]
+    if not boundaries:
+        pieces, current, current_bytes = [], [], 0
+        for ch in text:
+            ch_bytes = _ssml_bytes(html.escape(ch))
+            if current and current_bytes + ch_bytes > max_bytes:
+                pieces.append("".join(current))
+                current, current_bytes = [], 0
+            current.append(ch)
+            current_bytes += ch_bytes
+        if current:
+            pieces.append("".join(current))
+        return pieces
+    pieces = []
+    for part in _split_at(text, boundaries[0]):
+        pieces.extend(_split_to_fit(part, max_bytes, boundaries[1:]))
+    return pieces
+
+def _build_ssml(title: str, author: str, paragraphs: List[str], log_extra: dict = None) -> List[str]:
+    """
+    Packs an article into as few SSML chunks of at most MAX_BYTES bytes as possible.
+    Paragraphs are split at sentence boundaries (then clauses, words, characters for oversize
+    sentences) and packed greedily, so each chunk is filled close to the limit. Byte counts
+    include the <speak> wrapper, paragraph markup, breaks and escaping exactly.
+    """
     logger.debug(f"Building SSML for '{title}', by '{author}', {len(paragraphs)} paragraphs.", extra=log_extra)
-    speak_open_tag, speak_close_tag = "<speak>", "</speak>"
+    budget = MAX_BYTES - len(SPEAK_OPEN) - len(SPEAK_CLOSE)
+    unit_budget = budget - len(P_OPEN) - len(P_CLOSE) - len(PARAGRAPH_BREAK)  # Largest sentence piece that fits an empty chunk
+    chunks, current, current_bytes = [], [], 0
+
+    def flush():
+        nonlocal current, current_bytes
+        if current:
+            chunks.append(SPEAK_OPEN + "".join(current) + SPEAK_CLOSE)
+        current, current_bytes = [], 0
+
     prefix_content = ""
     if title:
-        prefix_content += f"<emphasis level='strong'>{html.escape(title)}</emphasis><break time='600ms'/>"
+        title_budget = budget - len("<emphasis level='strong'></emphasis><break time='600ms'/>")
+        prefix_content += f"<emphasis level='strong'>{html.escape(_split_to_fit(title, title_budget)[0])}</emphasis><break time='600ms'/>"
     if author:
-        prefix_content += f"By {html.escape(author)}<break time='800ms'/>"
-    chunks, current, current_bytes = [], [], len(speak_open_tag) + len(speak_close_tag)
+        author_budget = budget - _ssml_bytes(prefix_content) - len("By <break time='800ms'/>")
+        if author_budget > 0:
+            prefix_content += f"By {html.escape(_split_to_fit(author, author_budget)[0])}<break time='800ms'/>"
     if prefix_content:
-        prefix_bytes = len(prefix_content.encode('utf-8'))
-        if prefix_bytes < MAX_BYTES - current_bytes:
-            current.append(prefix_content)
-            current_bytes += prefix_bytes
-        else:
-            logger.warning("SSML prefix is too long, splitting.")
-            chunks.append(speak_open_tag + prefix_content[:MAX_BYTES//2] + speak_close_tag)
-            prefix_content = prefix_content[MAX_BYTES//2:]
+        current.append(prefix_content)
+        current_bytes = _ssml_bytes(prefix_content)
+
     for p in paragraphs:
-        if not p.strip():
-            continue
-        p_ssml = f"<p>{html.escape(p)}</p><break time='500ms'/>"
-        p_bytes = len(p_ssml.encode('utf-8'))
-        if current_bytes + p_bytes > MAX_BYTES:
-            if current:
-                chunks.append(speak_open_tag + "".join(current) + speak_close_tag)
-            current, current_bytes = [p_ssml], len(speak_open_tag) + len(speak_close_tag) + p_bytes
-        else:
-            current.append(p_ssml)
-            current_bytes += p_bytes
-    if current:
-        chunks.append(speak_open_tag + "".join(current) + speak_close_tag)
-    logger.info(f"Built {len(chunks)} SSML chunk(s).")
+        units = [html.escape(piece) for sentence in _split_at(p, _SENTENCE_BOUNDARY_RE)
+                 for piece in _split_to_fit(sentence, unit_budget)]
+        i = 0
+        while i < len(units):
+            # Take as many sentences as fit in what is left of the current chunk
+            remaining = budget - current_bytes
+            piece_bytes, j = len(P_OPEN) + len(P_CLOSE), i
+            while j < len(units):
+                unit_bytes = _ssml_bytes(units[j]) + (1 if j > i else 0)  # Joining space
+                tail_bytes = len(PARAGRAPH_BREAK) if j == len(units) - 1 else 0
+                if piece_bytes + unit_bytes + tail_bytes > remaining:
+                    break
+                piece_bytes += unit_bytes
+                j += 1
+            if j == i:
+                flush()  # Nothing fits; every unit fits an empty chunk, so this always makes progress
+                continue
+            piece = P_OPEN + " ".join(units[i:j]) + P_CLOSE
+            if j == len(units):
+                piece += PARAGRAPH_BREAK
+            current.append(piece)
+            current_bytes += _ssml_bytes(piece)
+            i = j
+    flush()
+
+    logger.info(f"Built {len(chunks)} SSML chunk(s).", extra=log_extra)
     if not chunks:
-        logger.warning("No SSML chunks generated; text was empty or too fragmented.")
+        logger.warning("No SSML chunks generated; text was empty or too fragmented.", extra=log_extra)
     return chunks
 
+def _synthesize_chunk(tts_client, ssml_text: str, voice_params, audio_config, cache: SegmentCache = None, cache_key: str = None,
+                      checkpoint: ItemCheckpoint = None, idx: int = None) -> tuple[bytes, bool]:
+    """
+    Returns (mp3_bytes, reused) for a single SSML chunk.
+    The TTS API is only called when neither the segment cache nor the item's checkpoint has it.
+    """
+    if cache is not None and cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+    if checkpoint is not None:
+        saved = checkpoint.get(idx)
+        if saved is not None:
+            return saved, True
+    response = _call_synthesize_hedged(
+        tts_client,
+        {"input": texttospeech.SynthesisInput(ssml=ssml_text),
+         "voice": voice_params,
+         "audio_config": audio_config},
+        characters=len(ssml_text),
+        latency_key=voice_params.name,
+    )
+    if cache is not None and cache_key:
+        cache.put(cache_key, response.audio_content)
+    if checkpoint is not None:
+        checkpoint.put(idx, response.audio_content)
+    return response.audio_content, False
+
+def _iter_synthesized_chunks(tts_client, ssml_chunks: List[str], voice_params, audio_config,
+                             cache: SegmentCache = None, cache_keys: List[str] = None,
+                             checkpoint: ItemCheckpoint = None, log_extra: dict = None):
+    """
+    Yields the audio for each SSML chunk in chunk order while a bounded thread pool works ahead.
+    At most 2x TTS_MAX_WORKERS segments are in flight or waiting to be consumed, so memory stays
+    bounded however long the article is. The first failing chunk cancels every chunk that has not
+    started yet and is raised as TTSError.
+    """
+    if cache_keys is None:
+        cache_keys = [None] * len(ssml_chunks)
+    workers = max(1, min(TTS_MAX_WORKERS, len(ssml_chunks)))
+    window = workers * 2
+    logger.info(f"TTS: Synthesizing {len(ssml_chunks)} chunk(s) with {workers} worker(s).", extra=log_extra)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-synth")
+    pending = {}  # chunk index -> future, for chunks submitted but not yet yielded
+    next_submit, reused = 0, 0
+    try:
+        for idx in range(len(ssml_chunks)):
+            while next_submit < len(ssml_chunks) and next_submit < idx + window:
+                pending[next_submit] = executor.submit(
+                    _synthesize_chunk, tts_client, ssml_chunks[next_submit], voice_params, audio_config,
+                    cache, cache_keys[next_submit], checkpoint, next_submit
+                )
+                next_submit += 1
+            future = pending[idx]
+            # Wait for this chunk, but surface a failure in any chunk ahead of it straight away.
+            while True:
+                failed = [i for i, f in pending.items() if f.done() and not f.cancelled() and f.exception() is not None]
+                if failed:
+                    failed_idx = min(failed)
+                    e = pending[failed_idx].exception()
+                    logger.error(f"TTS: Failed to synthesize SSML chunk {failed_idx+1}/{len(ssml_chunks)}: {e}", exc_info=e, extra=log_extra)
+                    raise TTSError(f"TTS failed for chunk {failed_idx+1}: {e}") from e
+                if future.done():
+                    break
+                wait([f for f in pending.values() if not f.done()], return_when=FIRST_COMPLETED)
+            audio_content, was_reused = pending.pop(idx).result()
+            reused += was_reused
+            logger.debug(f"TTS: {'Reused' if was_reused else 'Synthesized'} segment {idx+1} ({len(audio_content)} bytes)", extra=log_extra)
+            yield audio_content
+        logger.info(f"TTS: {reused}/{len(ssml_chunks)} segment(s) reused from cache or checkpoint.", extra=log_extra)
+    finally:
+        # Don't block on chunks still in flight after a failure or early close; queued ones are cancelled.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _upload_streaming(blob, segments, joiner: Mp3Joiner):
+    """
+    Writes joined frames into a resumable upload as each segment arrives, with no temp files.
+    If anything fails the upload is cancelled, so an existing object is never replaced by partial audio.
+    """
+    with blob.open("wb", content_type="audio/mpeg", chunk_size=UPLOAD_CHUNK_BYTES) as writer:
+        for audio_content in segments:
+            writer.write(joiner.add(audio_content))
+
+def _upload_buffered(blob, segments, joiner: Mp3Joiner):
+    """Joins every segment in memory, then uploads the result in a single request."""
+    merged_audio = b"".join(joiner.add(audio_content) for audio_content in segments)
+    blob.upload_from_string(merged_audio, content_type="audio/mpeg")
+
+def _build_manifest(joiner: Mp3Joiner, cache_keys: List[str], fingerprint: str, voice_name: str, speaking_rate: float) -> dict:
+    """Summarizes an uploaded MP3 so readers never need to probe or fetch the object."""
+    duration = joiner.duration_seconds
+    return {
+        "duration_seconds": round(duration, 3),
+        "size_bytes": joiner.total_bytes,
+        "bitrate_kbps": round(joiner.total_bytes * 8 / duration / 1000) if duration else 0,
+        "sample_rate": joiner.sample_rate,
+        "segment_count": joiner.segment_count,
+        "segment_hashes": [key[:16] for key in cache_keys],  # Truncated to stay well inside GCS's 8 KiB metadata limit
+        "fingerprint": fingerprint,
+        "voice": voice_name,
+        "speaking_rate": speaking_rate,
+    }
+
+def read_audio_manifest(blob):
+    """Returns the manifest stored in a blob's metadata, or None for uploads that predate manifests."""
+    raw = (blob.metadata or {}).get(AUDIO_MANIFEST_METADATA_KEY)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.warning(f"TTS: Ignoring malformed audio manifest on {blob.name}.")
+        return None
+
 def synthesize_long_text(
     title: str,
     author: str,
@@ -92,35 +531,27 @@ def synthesize_long_text(
 ) -> Dict[str, any]:
     """
     Synthesizes long-form text using Google TTS, uploads MP3 to GCS, returns dict with result.
+    Every upload carries an audio manifest (duration, size, bitrate, segment hashes, voice) in its
+    blob metadata; an existing upload whose manifest matches the current text and voice is reused.
     """
     if log_extra is None:
         log_extra = {}
     logger.info(f"TTS: Synthesizing item {item_id}: '{title}' with voice {voice_name}", extra=log_extra)
     try:
-        tts_client = _get_tts_client()
-        _, bucket = _get_storage_client_and_bucket()
+        tts_client = _get_tts_client(log_extra)
+        _, bucket = _get_storage_client_and_bucket(log_extra)
     except Exception as e:
         return {"uri": None, "duration_seconds": 0, "error": f"Failed to initialize GCP clients: {str(e)}"}
 
     output_gcs_filename = f"{item_id}.mp3"
     blob = bucket.blob(output_gcs_filename)
 
-    if not force_overwrite and blob.exists():
-        logger.info(f"TTS: File {output_gcs_filename} already exists in GCS and force_overwrite is False. Skipping synthesis.", extra=log_extra)
-        return {
-            "gcs_path": output_gcs_filename,
-            "duration_seconds": 0,  # Duration is unknown without probing, which we skip.
-            "gcs_bucket": GCS_BUCKET,
-            "num_segments": 0,
-            "error": "skipped_existing_file"
-        }
-
     paras = [p.strip() for p in full_text.split('\n') if p.strip()]
     if not paras and not title and not author:
         logger.warning(f"TTS: No content for item {item_id}. Aborting.", extra=log_extra)
         return {"uri": None, "duration_seconds": 0, "error": "No content to synthesize."}
 
-    ssml_chunks = _build_ssml(title, author, paras)
+    ssml_chunks = _build_ssml(title, author, paras, log_extra=log_extra)
     if not ssml_chunks:
         logger.warning(f"TTS: No SSML for item {item_id}. Aborting.", extra=log_extra)
         return {"uri": None, "duration_seconds": 0, "error": "SSML generation resulted in no chunks."}
@@ -128,80 +559,85 @@ def synthesize_long_text(
     total_chars = sum(len(chunk) for chunk in ssml_chunks)
     logger.info(f"TTS: Total billable characters for {item_id}: {total_chars}", extra=log_extra)
 
-    segment_files = []
+    audio_encoding = texttospeech.AudioEncoding.MP3
     audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3,
+        audio_encoding=audio_encoding,
         speaking_rate=speaking_rate,
     )
+    cache_keys = [segment_key(chunk, voice_name, speaking_rate, audio_encoding.name) for chunk in ssml_chunks]
+    fingerprint = content_fingerprint(cache_keys)
+
+    if not force_overwrite:
+        existing = bucket.get_blob(output_gcs_filename)
+        if existing is not None:
+            existing_manifest = read_audio_manifest(existing)
+            if existing_manifest is None:
+                logger.info(f"TTS: File {output_gcs_filename} already exists in GCS and force_overwrite is False. Skipping synthesis.", extra=log_extra)
+                return {
+                    "gcs_path": output_gcs_filename,
+                    "duration_seconds": 0,  # Legacy upload without a manifest; duration was never recorded.
+                    "gcs_bucket": GCS_BUCKET,
+                    "num_segments": 0,
+                    "storage_bytes": existing.size,
+                    "error": "skipped_existing_file"
+                }
+            if existing_manifest.get("fingerprint") == fingerprint:
+                logger.info(f"TTS: {output_gcs_filename} already holds this text and voice. Skipping synthesis.", extra=log_extra)
+                return {
+                    "gcs_path": output_gcs_filename,
+                    "duration_seconds": existing_manifest.get("duration_seconds", 0),
+                    "gcs_bucket": GCS_BUCKET,
+                    "num_segments": existing_manifest.get("segment_count", 0),
+                    "storage_bytes": existing_manifest.get("size_bytes", existing.size),
+                    "manifest": existing_manifest,
+                    "skipped": True,
+                    "error": None
+                }
+            logger.info(f"TTS: Text or voice changed since {output_gcs_filename} was rendered; re-synthesizing.", extra=log_extra)
+
+    segment_cache = _get_segment_cache(bucket)
+    checkpoint = None
+    if TTS_CHECKPOINT_PREFIX:
+        checkpoint = ItemCheckpoint(bucket, TTS_CHECKPOINT_PREFIX, item_id, cache_keys)
+        checkpoint.open(log_extra)
 
     try:
-        with tempfile.TemporaryDirectory(prefix=f"speakloudtts_{item_id}_") as tmpdir:
-            logger.info(f"TTS: Using temp dir {tmpdir}", extra=log_extra)
-            # Synthesize all chunks
-            for idx, ssml_text in enumerate(ssml_chunks):
-                lang_code = "-".join(voice_name.split('-')[:2])
-                voice_params = texttospeech.VoiceSelectionParams(language_code=lang_code, name=voice_name)
-                try:
-                    response = tts_client.synthesize_speech(
-                        request={"input": texttospeech.SynthesisInput(ssml=ssml_text),
-                                 "voice": voice_params,
-                                 "audio_config": audio_config}
-                    )
-                    seg_path = os.path.join(tmpdir, f"segment_{idx}.mp3")
-                    with open(seg_path, "wb") as out_file:
-                        out_file.write(response.audio_content)
-                    segment_files.append(seg_path)
-                    logger.debug(f"TTS: Saved segment {idx+1} to {seg_path}", extra=log_extra)
-                except Exception as e:
-                    logger.error(f"TTS: Failed to synthesize SSML chunk {idx+1}/{len(ssml_chunks)}: {e}", exc_info=True, extra=log_extra)
-                    raise TTSError(f"TTS failed for chunk {idx+1}: {e}") from e
-            if not segment_files:
-                logger.error(f"TTS: No segments produced for {item_id}.", extra=log_extra)
-                return {"uri": None, "duration_seconds": 0, "error": "No audio segments produced by TTS."}
-
-            # Write concat file for ffmpeg
-            concat_path = os.path.join(tmpdir, "segments.txt")
-            with open(concat_path, "w") as f:
-                for path in segment_files:
-                    f.write(f"file '{path}'\n")
-            merged_path = os.path.join(tmpdir, output_gcs_filename)
-            ffmpeg_cmd = [
-                "ffmpeg", "-y", "-f", "concat", "-safe", "0",
-                "-i", concat_path, "-c", "copy", merged_path
-            ]
-            logger.info(f"TTS: Running ffmpeg: {' '.join(ffmpeg_cmd)}", extra=log_extra)
-            process = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-            if process.returncode != 0:
-                err_msg = f"ffmpeg failed with code {process.returncode}. Stderr: {process.stderr.strip()}. Stdout: {process.stdout.strip()}"
-                logger.error(f"TTS: {err_msg}", extra=log_extra)
-                raise TTSError(err_msg)
-
-            # Probe duration (optional)
-            duration = 0.0
+        # Synthesize concurrently and join MPEG frames in chunk order; the frame count gives the exact duration
+        lang_code = "-".join(voice_name.split('-')[:2])
+        voice_params = texttospeech.VoiceSelectionParams(language_code=lang_code, name=voice_name)
+        joiner = Mp3Joiner()
+        upload = _upload_streaming if TTS_UPLOAD_MODE == "stream" else _upload_buffered
+        with closing(_iter_synthesized_chunks(tts_client, ssml_chunks, voice_params, audio_config,
+                                              cache=segment_cache, cache_keys=cache_keys,
+                                              checkpoint=checkpoint, log_extra=log_extra)) as segments:
             try:
-                ffprobe_cmd = [
-                    "ffprobe", "-v", "error", "-show_entries", "format=duration",
-                    "-of", "default=noprint_wrappers=1:nokey=1", merged_path
-                ]
-                res = subprocess.run(ffprobe_cmd, capture_output=True, text=True, check=True)
-                duration = float(res.stdout.strip())
-                logger.info(f"TTS: Duration: {duration:.2f}s")
-            except Exception as e:
-                logger.warning(f"TTS: Could not probe audio duration: {e}")
-
-            # Upload to GCS
-            blob.upload_from_filename(merged_path, content_type="audio/mpeg")
-            logger.info(f"TTS: Uploaded to gs://{GCS_BUCKET}/{output_gcs_filename}")
-
-            return {
-                "gcs_path": output_gcs_filename,
-                "duration_seconds": duration,
-                "gcs_bucket": GCS_BUCKET,
-                "num_segments": len(segment_files),
-                "error": None
-            }
+                upload(blob, segments, joiner)
+            except ValueError as e:
+                raise TTSError(f"Could not join audio segments: {e}") from e
+        duration = joiner.duration_seconds
+        logger.info(f"TTS: Uploaded {joiner.segment_count} segment(s), {joiner.total_bytes} bytes, duration {duration:.2f}s "
+                    f"to gs://{GCS_BUCKET}/{output_gcs_filename} ({TTS_UPLOAD_MODE} mode)", extra=log_extra)
+        if checkpoint is not None:
+            checkpoint.clear(log_extra)
+
+        manifest = _build_manifest(joiner, cache_keys, fingerprint, voice_name, speaking_rate)
+        try:
+            blob.metadata = {AUDIO_MANIFEST_METADATA_KEY: json.dumps(manifest, separators=(",", ":"))}
+            blob.patch()
+        except Exception as e:
+            logger.warning(f"TTS: Could not attach audio manifest to {output_gcs_filename}: {e}", extra=log_extra)
+
+        return {
+            "gcs_path": output_gcs_filename,
+            "duration_seconds": duration,
+            "gcs_bucket": GCS_BUCKET,
+            "num_segments": joiner.segment_count,
+            "storage_bytes": joiner.total_bytes,
+            "manifest": manifest,
+            "error": None
+        }
     except Exception as e:
-        logger.error(f"TTS: Critical error for {item_id}: {e}", exc_info=True)
+        logger.error(f"TTS: Critical error for {item_id}: {e}", exc_info=True, extra=log_extra)
         return {
             "gcs_path": None, "duration_seconds": 0, "error": f"Synthesis process failed: {str(e)}"
         }